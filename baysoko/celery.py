@@ -71,8 +71,15 @@ try:
 except Exception:
     pass
 
+# M-Pesa status polling is I/O bound and slow; keep it off the default and
+# periodic queues so it cannot starve them.
+app.conf.task_routes = {
+    'storefront.tasks.reconcile_mpesa_transactions': {'queue': 'mpesa'},
+}
+
 # Periodic tasks (Celery Beat)
 try:
+    from datetime import timedelta
     from celery.schedules import crontab
     # Run subscription expiration check daily at 03:00 UTC
     app.conf.beat_schedule = getattr(app.conf, 'beat_schedule', {})
@@ -93,7 +100,28 @@ try:
             # Every Monday at 04:00 UTC
             'schedule': crontab(minute=0, hour=4, day_of_week=1),
             'options': {'queue': 'periodic'},
-        }
+        },
+        'process-subscriptions': {
+            'task': 'storefront.tasks.process_subscriptions',
+            'schedule': crontab(minute='*/15'),
+            'options': {'queue': 'periodic'},
+        },
+        'process-subscription-renewals': {
+            'task': 'storefront.tasks.process_subscription_renewals',
+            # One STK push per due subscription a day, sent in the morning
+            'schedule': crontab(minute=0, hour=8),
+            'options': {'queue': 'periodic'},
+        },
+        'reconcile-mpesa-transactions': {
+            'task': 'storefront.tasks.reconcile_mpesa_transactions',
+            'schedule': timedelta(minutes=2),
+        },
+        'process-scheduled-withdrawals': {
+            'task': 'storefront.tasks.process_scheduled_withdrawals',
+            # Withdrawals are scheduled for Thursdays
+            'schedule': crontab(minute=0, hour=9, day_of_week=4),
+            'options': {'queue': 'periodic'},
+        },
     })
 except Exception:
     # If celery.schedules isn't available at import time, skip schedule setup
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0046_order_platform_tax_order_subtotal_order_tax_rate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['listing', '-created_at', '-id'], name='review_listing_recent_idx'),
+        ),
+    ]
@@ -1058,7 +1058,15 @@ class Payment(models.Model):
             self.transaction_id = str(transaction_id)
         self.completed_at = timezone.now()
         self.save()
+        self.finalize_order()
 
+    def finalize_order(self):
+        """Mark the order paid and notify buyer and sellers.
+
+        Split out of mark_as_completed so callers that have already written
+        the completed state (e.g. with a conditional bulk update) can run
+        the side effects without saving the payment again.
+        """
         # Mark order as paid
         self.order.mark_as_paid()
 
@@ -1379,6 +1387,10 @@ class Review(models.Model):
                 condition=Q(review_type='order')
             ),
         ]
+        indexes = [
+            # Keyset pagination of a store's reviews, newest first
+            models.Index(fields=['listing', '-created_at', '-id'], name='review_listing_recent_idx'),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
@@ -12,3 +12,5 @@ class StorefrontConfig(AppConfig):
             from . import signals  # noqa: F401
         except Exception:
             pass
+        # Cached store stats must stay current, so these are not optional
+        from . import stats_signals  # noqa: F401
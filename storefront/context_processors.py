@@ -1,11 +1,15 @@
 # storefront/context_processors.py
-from .models import Store, Subscription
 from types import SimpleNamespace
 from listings.models import Listing
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from .models import Store, InventoryAlert
+from .utils.db import database_available
+from .utils.subscription import latest_subscriptions_by_store
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Mapping of plan keys to badge CSS classes used in templates
 plan_color_map = {
@@ -25,12 +29,14 @@ def store_context(request):
         # Get user's stores
         user_stores = Store.objects.filter(owner=request.user)
         
-        # Annotate each store with current subscription plan
-        annotated_stores = []
+        # Latest subscription per store in one query (None means free plan)
+        latest_subscriptions = latest_subscriptions_by_store(request.user)
+        
+        # Plan info for each store, kept alongside (not on) the Store instance
+        user_stores_info = []
         
         for store in user_stores:
-            # Get effective subscription (may return None for free plan)
-            subscription = store.get_effective_subscription(owner=request.user, create_if_missing=False)
+            subscription = latest_subscriptions.get(store.id)
             
             # Determine plan
             if subscription:
@@ -53,19 +59,19 @@ def store_context(request):
                     current_period_end=None
                 )
             
-            # Attach transient attributes
-            store.plan = plan_key
-            store.current_plan = plan_key
-            store.plan_label = plan_label
-            store.plan_badge_class = plan_color_map.get(plan_key, 'bg-secondary')
-            store.is_trialing_plan = is_trial
-            store.subscription = subscription
-            
-            annotated_stores.append(store)
+            user_stores_info.append({
+                'store': store,
+                'plan': plan_key,
+                'plan_label': plan_label,
+                'badge_class': plan_color_map.get(plan_key, 'bg-secondary'),
+                'is_trial': is_trial,
+                'subscription': subscription,
+            })
         
         context.update({
-            'user_stores': annotated_stores,
-            'total_user_stores': user_stores.count(),
+            'user_stores': [entry['store'] for entry in user_stores_info],
+            'user_stores_info': user_stores_info,
+            'total_user_stores': len(user_stores_info),
         })
     
     return context
@@ -78,13 +84,13 @@ def subscription_context(request):
         # Get all stores owned by user
         user_stores = request.user.stores.all()
         
+        # Latest subscription per store in one query
+        latest_subscriptions = latest_subscriptions_by_store(request.user)
+        
         # Get active subscription for each store
         active_subscriptions = []
         for store in user_stores:
-            try:
-                subscription = store.get_effective_subscription(owner=request.user, create_if_missing=False)
-            except Exception:
-                subscription = Subscription.objects.filter(store=store).order_by('-created_at').first()
+            subscription = latest_subscriptions.get(store.id)
 
             if subscription and getattr(subscription, 'is_active', lambda: False)():
                 active_subscriptions.append({
@@ -116,171 +122,176 @@ def bulk_operations_context(request):
     """
     context = {}
     
-    if request.user.is_authenticated:
+    if not request.user.is_authenticated:
+        return context
+    
+    # Probe the database once; when it is unavailable skip every query below
+    # instead of paying a failed round trip for each one.
+    if not database_available():
+        return context
+    
+    try:
+        # Import batch/export models lazily; they may not exist before migrations
         try:
-            # Import batch/export models lazily; they may not exist before migrations
-            try:
-                from .models_bulk import BatchJob, ExportJob
-            except Exception:
-                BatchJob = None
-                ExportJob = None
+            from .models_bulk import BatchJob, ExportJob
+        except Exception:
+            BatchJob = None
+            ExportJob = None
 
-            # Get user's stores
-            user_stores = Store.objects.filter(owner=request.user)
+        # Get user's stores
+        user_stores = Store.objects.filter(owner=request.user)
+        
+        if user_stores.exists():
+            # Filled in as we go so a database error still leaves the
+            # partial results available to templates.
+            bulk_context = {}
+            context['bulk_operations_context'] = bulk_context
             
-            if user_stores.exists():
-                # Count pending batch jobs
-                try:
-                    pending_jobs = BatchJob.objects.filter(
-                        store__in=user_stores,
-                        status__in=['pending', 'processing']
-                    ).count() if BatchJob else 0
-                except (DatabaseError, OperationalError):
-                    pending_jobs = 0
+            # Count pending batch jobs
+            pending_jobs = BatchJob.objects.filter(
+                store__in=user_stores,
+                status__in=['pending', 'processing']
+            ).count() if BatchJob else 0
+            bulk_context.update({
+                'pending_jobs_count': pending_jobs,
+                'has_pending_jobs': pending_jobs > 0,
+            })
+            
+            # Get recent completed exports (last 7 days)
+            bulk_context['recent_exports'] = list(ExportJob.objects.filter(
+                store__in=user_stores,
+                status='completed',
+                created_at__gte=timezone.now() - timedelta(days=7)
+            ).select_related('store').only(
+                'id', 'export_type', 'format', 'file', 'status', 'created_at',
+                'store__name', 'store__slug',
+            ).order_by('-created_at')[:5]) if ExportJob else []
+            
+            # Count active inventory alerts
+            active_alerts = InventoryAlert.objects.filter(
+                store__in=user_stores,
+                is_active=True
+            ).count()
+            bulk_context.update({
+                'active_alerts_count': active_alerts,
+                'has_active_alerts': active_alerts > 0,
+            })
+            
+            # Check for critical alerts
+            critical_alerts = []
+            for store in user_stores:
+                # Check for low stock items
+                low_stock_items = store.listings.filter(
+                    stock__lte=5,
+                    stock__gt=0
+                ).count()
                 
-                # Get recent completed exports (last 7 days)
-                try:
-                    recent_exports = ExportJob.objects.filter(
-                        store__in=user_stores,
-                        status='completed',
-                        created_at__gte=timezone.now() - timedelta(days=7)
-                    ).order_by('-created_at')[:5] if ExportJob else []
-                except (DatabaseError, OperationalError):
-                    recent_exports = []
+                out_of_stock_items = store.listings.filter(
+                    stock=0
+                ).count()
                 
-                # Count active inventory alerts
-                try:
-                    active_alerts = InventoryAlert.objects.filter(
-                        store__in=user_stores,
-                        is_active=True
-                    ).count()
-                except (DatabaseError, OperationalError):
-                    active_alerts = 0
+                if low_stock_items > 10:
+                    critical_alerts.append({
+                        'store': store.name,
+                        'type': 'low_stock',
+                        'count': low_stock_items,
+                        'message': f'{low_stock_items} products have low stock'
+                    })
                 
-                # Check for critical alerts
-                critical_alerts = []
-                for store in user_stores:
-                    # Check for low stock items
-                    low_stock_items = store.listings.filter(
+                if out_of_stock_items > 5:
+                    critical_alerts.append({
+                        'store': store.name,
+                        'type': 'out_of_stock',
+                        'count': out_of_stock_items,
+                        'message': f'{out_of_stock_items} products are out of stock'
+                    })
+            bulk_context.update({
+                'critical_alerts': critical_alerts,
+                'has_critical_alerts': len(critical_alerts) > 0,
+            })
+            
+            # Get recent bulk operations (last 24 hours)
+            bulk_context['recent_operations'] = list(BatchJob.objects.filter(
+                store__in=user_stores,
+                created_at__gte=timezone.now() - timedelta(hours=24)
+            ).select_related('store').only(
+                'id', 'job_type', 'status', 'total_items', 'processed_items', 'created_at',
+                'store__name', 'store__slug',
+            ).order_by('-created_at')[:3]) if BatchJob else []
+            
+            # Calculate inventory health score
+            inventory_health_scores = []
+            for store in user_stores:
+                total_products = store.listings.count()
+                if total_products > 0:
+                    out_of_stock = store.listings.filter(stock=0).count()
+                    low_stock = store.listings.filter(stock__lte=5, stock__gt=0).count()
+                    
+                    # Calculate health percentage (lower out-of-stock is better)
+                    out_of_stock_percentage = (out_of_stock / total_products) * 100
+                    health_percentage = 100 - min(out_of_stock_percentage, 50)  # Cap at 50% penalty
+                    
+                    # Adjust for low stock
+                    low_stock_percentage = (low_stock / total_products) * 100
+                    health_percentage -= min(low_stock_percentage / 2, 25)  # Smaller penalty for low stock
+                    
+                    inventory_health_scores.append({
+                        'store': store,
+                        'score': max(health_percentage, 0),  # Ensure non-negative
+                        'total_products': total_products,
+                        'out_of_stock': out_of_stock,
+                        'low_stock': low_stock
+                    })
+            
+            bulk_context.update({
+                'inventory_health_scores': inventory_health_scores,
+                'total_stores': user_stores.count(),
+            })
+            
+            # Add store-specific context if we're in a store view
+            store_slug = None
+            
+            # Try to get store slug from URL patterns
+            if hasattr(request, 'resolver_match') and request.resolver_match:
+                kwargs = request.resolver_match.kwargs
+                store_slug = kwargs.get('slug') or kwargs.get('store_slug')
+            
+            if store_slug:
+                try:
+                    current_store = Store.objects.get(slug=store_slug, owner=request.user)
+                    
+                    # Store-specific stats
+                    store_pending_jobs = BatchJob.objects.filter(
+                        store=current_store,
+                        status__in=['pending', 'processing']
+                    ).count() if BatchJob else 0
+                    
+                    store_low_stock = current_store.listings.filter(
                         stock__lte=5,
                         stock__gt=0
                     ).count()
                     
-                    out_of_stock_items = store.listings.filter(
-                        stock=0
-                    ).count()
-                    
-                    if low_stock_items > 10:
-                        critical_alerts.append({
-                            'store': store.name,
-                            'type': 'low_stock',
-                            'count': low_stock_items,
-                            'message': f'{low_stock_items} products have low stock'
-                        })
+                    store_out_of_stock = current_store.listings.filter(stock=0).count()
                     
-                    if out_of_stock_items > 5:
-                        critical_alerts.append({
-                            'store': store.name,
-                            'type': 'out_of_stock',
-                            'count': out_of_stock_items,
-                            'message': f'{out_of_stock_items} products are out of stock'
-                        })
-                
-                # Get recent bulk operations (last 24 hours)
-                try:
-                    recent_operations = BatchJob.objects.filter(
-                        store__in=user_stores,
-                        created_at__gte=timezone.now() - timedelta(hours=24)
-                    ).select_related('store').order_by('-created_at')[:3] if BatchJob else []
-                except (DatabaseError, OperationalError):
-                    recent_operations = []
-                
-                # Calculate inventory health score
-                inventory_health_scores = []
-                for store in user_stores:
-                    total_products = store.listings.count()
-                    if total_products > 0:
-                        out_of_stock = store.listings.filter(stock=0).count()
-                        low_stock = store.listings.filter(stock__lte=5, stock__gt=0).count()
-                        
-                        # Calculate health percentage (lower out-of-stock is better)
-                        out_of_stock_percentage = (out_of_stock / total_products) * 100
-                        health_percentage = 100 - min(out_of_stock_percentage, 50)  # Cap at 50% penalty
-                        
-                        # Adjust for low stock
-                        low_stock_percentage = (low_stock / total_products) * 100
-                        health_percentage -= min(low_stock_percentage / 2, 25)  # Smaller penalty for low stock
-                        
-                        inventory_health_scores.append({
-                            'store': store,
-                            'score': max(health_percentage, 0),  # Ensure non-negative
-                            'total_products': total_products,
-                            'out_of_stock': out_of_stock,
-                            'low_stock': low_stock
-                        })
-                
-                # Add to context
-                context.update({
-                    'bulk_operations_context': {
-                        'pending_jobs_count': pending_jobs,
-                        'has_pending_jobs': pending_jobs > 0,
-                        'recent_exports': recent_exports,
-                        'active_alerts_count': active_alerts,
-                        'has_active_alerts': active_alerts > 0,
-                        'critical_alerts': critical_alerts,
-                        'has_critical_alerts': len(critical_alerts) > 0,
-                        'recent_operations': recent_operations,
-                        'inventory_health_scores': inventory_health_scores,
-                        'total_stores': user_stores.count(),
-                    }
-                })
-                
-                # Add store-specific context if we're in a store view
-                store_slug = None
-                
-                # Try to get store slug from URL patterns
-                if hasattr(request, 'resolver_match') and request.resolver_match:
-                    kwargs = request.resolver_match.kwargs
-                    store_slug = kwargs.get('slug') or kwargs.get('store_slug')
-                
-                if store_slug:
-                    try:
-                        current_store = Store.objects.get(slug=store_slug, owner=request.user)
-                        
-                        # Store-specific stats
-                        try:
-                            store_pending_jobs = BatchJob.objects.filter(
-                                store=current_store,
-                                status__in=['pending', 'processing']
-                            ).count() if BatchJob else 0
-                        except (DatabaseError, OperationalError):
-                            store_pending_jobs = 0
-                        
-                        store_low_stock = current_store.listings.filter(
-                            stock__lte=5,
-                            stock__gt=0
-                        ).count()
-                        
-                        store_out_of_stock = current_store.listings.filter(stock=0).count()
-                        
-                        context['bulk_operations_context'].update({
-                            'current_store': {
-                                'name': current_store.name,
-                                'slug': current_store.slug,
-                                'pending_jobs': store_pending_jobs,
-                                'low_stock_count': store_low_stock,
-                                'out_of_stock_count': store_out_of_stock,
-                                'total_products': current_store.listings.count(),
-                                'is_premium': current_store.is_premium,
-                            }
-                        })
-                    except Store.DoesNotExist:
-                        pass
-        
-        except Exception as e:
-            # Log error but don't break the site
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error in bulk_operations_context: {str(e)}")
+                    bulk_context.update({
+                        'current_store': {
+                            'name': current_store.name,
+                            'slug': current_store.slug,
+                            'pending_jobs': store_pending_jobs,
+                            'low_stock_count': store_low_stock,
+                            'out_of_stock_count': store_out_of_stock,
+                            'total_products': current_store.listings.count(),
+                            'is_premium': current_store.is_premium,
+                        }
+                    })
+                except Store.DoesNotExist:
+                    pass
     
-    return context
\ No newline at end of file
+    except (DatabaseError, OperationalError) as e:
+        # Keep whatever was gathered before the failure
+        logger.warning(f"Database error in bulk_operations_context: {str(e)}")
+    except Exception as e:
+        # Log error but don't break the site
+        logger.error(f"Error in bulk_operations_context: {str(e)}")
+    
+    return context
@@ -1,8 +1,23 @@
+import re
+
 from django import forms
-from django.db import models
-from .models import Store
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Store, StoreReview, Subscription
 from listings.forms import ListingForm
-from .mpesa import MpesaGateway
+
+
+# Deletes every ASCII non-digit in one C-level pass (see UpgradeForm.clean_phone_number)
+_NON_DIGITS = str.maketrans('', '', ''.join(chr(i) for i in range(128) if not chr(i).isdigit()))
+
+# Accepted Kenyan formats: 07XXXXXXXX / 01XXXXXXXX, 7XXXXXXXX and
+# 2547XXXXXXXX / 2541XXXXXXXX; the subscriber part is captured so the
+# canonical number is '+254' + that group
+_KENYAN_PHONE_RE = re.compile(r'(?:0|254)(?P<local>[17]\d{8})|(?P<bare>7\d{8})')
+
+# Canonical Kenyan mobile number (without '+'); compiled once at import
+_PHONE_RE = re.compile(r'254[17]\d{8}')
 
 
 def _get_video_duration_seconds(uploaded_file):
@@ -56,64 +71,42 @@ def _get_video_duration_seconds(uploaded_file):
             pass
 
 
-# REPLACE the entire UpgradeForm section (from line 79) with this SINGLE, CORRECTED UpgradeForm:
-
 class UpgradeForm(forms.Form):
     """Form for upgrading to premium - Enhanced"""
     phone_number = forms.CharField(
-        max_length=12,  # Changed from 10 to 12 to accommodate +254 prefix
+        max_length=13,  # +2547XXXXXXXX
         widget=forms.TextInput(attrs={
             'class': 'form-control form-control-lg',
             'placeholder': '07XXXXXXXX or 7XXXXXXXX',
-            'pattern': '^[0-9]{9,12}$'
+            'pattern': '^\\+?[0-9]{9,12}$'
         })
     )
     
-    # Remove the hidden plan field if you're using session storage
-    # plan = forms.ChoiceField(
-    #     choices=Subscription.PLAN_CHOICES,
-    #     widget=forms.HiddenInput(),
-    #     required=False,
-    #     initial='basic'
-    # )
-    
     def clean_phone_number(self):
         phone = self.cleaned_data.get('phone_number', '')
         
         if not phone:
             raise forms.ValidationError('Phone number is required')
         
+        # Already canonical (+2547XXXXXXXX), e.g. a resubmitted form
+        if phone[0] == '+' and _PHONE_RE.fullmatch(phone, 1):
+            return phone
+        
         # Remove any non-digit characters
-        phone = ''.join(filter(str.isdigit, phone))
+        phone = phone.translate(_NON_DIGITS)
+        if not phone.isascii():
+            phone = ''.join(filter(str.isdigit, phone))
         
-        # Handle various Kenyan phone formats
-        if phone.startswith('0') and len(phone) == 10:  # 07XXXXXXXX
-            phone = '254' + phone[1:]  # Convert to 2547XXXXXXXX
-        elif phone.startswith('7') and len(phone) == 9:  # 7XXXXXXXX
-            phone = '254' + phone  # Convert to 2547XXXXXXXX
-        elif phone.startswith('254') and len(phone) == 12:  # 2547XXXXXXXX
-            pass  # Already correct
-        else:
+        # Handle various Kenyan phone formats in a single regex match
+        match = _KENYAN_PHONE_RE.fullmatch(phone)
+        if match is None:
             raise forms.ValidationError(
                 'Please enter a valid Kenyan phone number format: '
                 '07XXXXXXXX, 7XXXXXXXX, or 2547XXXXXXXX'
             )
         
-        # Final validation - must be 12 digits starting with 254
-        if len(phone) != 12 or not phone.startswith('254'):
-            raise forms.ValidationError('Invalid phone number format')
-        
-        return f"+{phone}"  # Return with + prefix
-    
-    def clean(self):
-        cleaned_data = super().clean()
-        # You can add additional validation here if needed
-        return cleaned_data
+        return f"+254{match['local'] or match['bare']}"  # Return with + prefix
 
-from django import forms
-from .models import Store, Subscription
-from django.utils import timezone
-from django.core.exceptions import ValidationError
 
 class MultiFileInput(forms.ClearableFileInput):
     allow_multiple_selected = True
@@ -131,7 +124,68 @@ class MultiFileField(forms.FileField):
         return single_file_clean(data, initial)
 
 
+def _live_subscriptions(store, request=None):
+    """(status, plan, trial_ends_at) of the store's active/trialing subscriptions, in one query.
+
+    When ``request`` is given the rows are memoised on it, so the view and
+    every form built while handling that request share a single query.
+    """
+    cache = getattr(request, '_live_subscriptions', None)
+    if cache is not None and store.pk in cache:
+        return cache[store.pk]
+
+    rows = list(
+        Subscription.objects.filter(
+            store=store,
+            status__in=('active', 'trialing')
+        ).values_list('status', 'plan', 'trial_ends_at')
+    )
+    if request is not None:
+        if cache is None:
+            cache = request._live_subscriptions = {}
+        cache[store.pk] = rows
+    return rows
+
+
+def store_feature_flags(store, request=None, now=None, subscriptions=None):
+    """Return ``(can_be_featured, is_enterprise)`` for an existing store.
+
+    A store can be featured with an active subscription or an unexpired
+    trial; enterprise stores (active enterprise plan) are always featured.
+    ``now`` defaults to the request's timestamp (set by SubscriptionMiddleware).
+    Pass ``subscriptions`` rows already read via _live_subscriptions() to
+    skip the query.
+    """
+    if subscriptions is None:
+        subscriptions = _live_subscriptions(store, request)
+    if now is None:
+        now = getattr(request, '_now', None) or timezone.now()
+    has_active = any(status == 'active' for status, _, _ in subscriptions)
+    has_valid_trial = any(
+        status == 'trialing' and trial_ends_at and trial_ends_at > now
+        for status, _, trial_ends_at in subscriptions
+    )
+    can_be_featured = has_active or has_valid_trial
+    is_enterprise = can_be_featured and any(
+        status == 'active' and plan == 'enterprise'
+        for status, plan, _ in subscriptions
+    )
+    return can_be_featured, is_enterprise
+
+
+SLUG_TAKEN_MESSAGE = "This store URL is already taken. Please choose a different one."
+
+
 class StoreForm(forms.ModelForm):
+    # Per-instance state set in __init__, declared here so every form
+    # starts from the same defaults
+    user = None
+    request = None
+    can_be_featured = False
+    is_enterprise = False
+    # Live subscription rows of the edited store, read once in __init__
+    _subscriptions = None
+
     store_videos = MultiFileField(
         required=False,
         widget=MultiFileInput(attrs={
@@ -140,6 +194,13 @@ class StoreForm(forms.ModelForm):
         }),
         help_text='Optional short store videos (up to 3, max 45s, 15MB each).'
     )
+    # Only offered when editing a store that can be featured (see __init__)
+    is_featured = forms.BooleanField(
+        required=False,
+        label='Featured Store',
+        help_text='Check to feature your store in listings',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
     class Meta:
         model = Store
@@ -157,12 +218,24 @@ class StoreForm(forms.ModelForm):
             'location_longitude': forms.HiddenInput(),
             'location_place_id': forms.HiddenInput(),
         }
+        # Slug uniqueness is enforced by the model's unique constraint (checked
+        # once by ModelForm.validate_unique and, for races, by the database)
+        error_messages = {
+            'slug': {'unique': SLUG_TAKEN_MESSAGE},
+        }
     
     def __init__(self, *args, **kwargs):
-        # Accept 'user' kwarg and remove it before calling parent
+        # Accept 'user' and 'request' kwargs and remove them before calling parent
         self.user = kwargs.pop('user', None)
+        self.request = kwargs.pop('request', None)
+        self._now = kwargs.pop('now', None) or getattr(self.request, '_now', None) or timezone.now()
         super().__init__(*args, **kwargs)
 
+        # Give new stores their owner up front so the model's store-limit
+        # checks run as part of form validation
+        if self.user is not None and not self.instance.pk and self.instance.owner_id is None:
+            self.instance.owner = self.user
+
         # Make logo and cover_image fields optional for editing
         if self.instance and self.instance.pk:
             self.fields['logo'].required = False
@@ -171,69 +244,29 @@ class StoreForm(forms.ModelForm):
         else:
             self.fields['location'].required = True
             
-        # Initialize these attributes
-        self.can_be_featured = False
-        self.is_enterprise = False
-        
         # Only check for existing stores (edit mode)
         if self.instance and self.instance.pk:
             # Check if store has active subscription or valid trial
             try:
-                has_active = Subscription.objects.filter(
-                    store=self.instance, 
-                    status='active'
-                ).exists()
-                has_valid_trial = Subscription.objects.filter(
-                    store=self.instance,
-                    status='trialing',
-                    trial_ends_at__gt=timezone.now()
-                ).exists()
-                
-                self.can_be_featured = has_active or has_valid_trial
-                
-                if self.can_be_featured:
-                    # Check if it's an enterprise subscription
-                    self.is_enterprise = Subscription.objects.filter(
-                        store=self.instance,
-                        status='active',
-                        plan='enterprise'
-                    ).exists()
-                    
-                    # Add is_featured field for premium stores
-                    self.fields['is_featured'] = forms.BooleanField(
-                        required=False,
-                        label='Featured Store',
-                        help_text='Check to feature your store in listings',
-                        widget=forms.CheckboxInput(attrs={
-                            'class': 'form-check-input',
-                            'disabled': self.is_enterprise
-                        }),
-                        initial=self.instance.is_featured,
-                        disabled=self.is_enterprise
-                    )
+                self._subscriptions = _live_subscriptions(self.instance, self.request)
+                self.can_be_featured, self.is_enterprise = store_feature_flags(
+                    self.instance, now=self._now, subscriptions=self._subscriptions
+                )
             except Exception as e:
                 # If there's an error (e.g., subscription table doesn't exist yet), 
-                # just don't add the featured field
+                # just don't offer the featured field
                 pass
-    
-    def clean_slug(self):
-        slug = self.cleaned_data.get('slug')
-        if slug:
-            # Check if slug is unique (excluding current store)
-            qs = Store.objects.filter(slug=slug)
-            if self.instance and self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
-                raise forms.ValidationError("This store URL is already taken. Please choose a different one.")
-        return slug
+
+        if self.can_be_featured:
+            # Premium stores may toggle featuring; enterprise stores always are
+            self.fields['is_featured'].initial = self.instance.is_featured
+            self.fields['is_featured'].disabled = self.is_enterprise
+        else:
+            del self.fields['is_featured']
     
     def clean(self):
         cleaned_data = super().clean()
 
-        # Ensure store owner can't change owner through form
-        if self.instance and self.instance.pk and 'owner' in cleaned_data:
-            del cleaned_data['owner']
-
         location = cleaned_data.get('location')
         if not location or not str(location).strip():
             raise ValidationError('Store location is required.')
@@ -255,11 +288,11 @@ class StoreForm(forms.ModelForm):
             store.is_featured = False
         else:
             # For existing stores, handle is_featured if the field exists
-            if 'is_featured' in self.cleaned_data and hasattr(self, 'can_be_featured'):
+            if 'is_featured' in self.cleaned_data:
                 if not self.can_be_featured:
                     # Non-premium users can't set featured
                     store.is_featured = False
-                elif hasattr(self, 'is_enterprise') and self.is_enterprise:
+                elif self.is_enterprise:
                     # Enterprise stores are always featured
                     store.is_featured = True
                 else:
@@ -267,11 +300,23 @@ class StoreForm(forms.ModelForm):
                     store.is_featured = self.cleaned_data.get('is_featured', False)
         
         if commit:
-            store.save()
+            self.save_store(store)
             self.save_m2m()
         
         return store
 
+    @staticmethod
+    def save_store(store):
+        """Save ``store``, reporting a slug lost to a concurrent request as a ValidationError."""
+        try:
+            with transaction.atomic():
+                store.save()
+        except IntegrityError:
+            # Another request claimed the slug after validation ran
+            if Store.objects.filter(slug=store.slug).exclude(pk=store.pk).exists():
+                raise ValidationError({'slug': SLUG_TAKEN_MESSAGE})
+            raise
+
     def clean_store_videos(self):
         videos = self.files.getlist('store_videos')
         if not videos:
@@ -291,31 +336,23 @@ class StoreForm(forms.ModelForm):
             
     def _get_featured_status(self, store):
         """Determine if store should be featured based on active subscription"""
-        from .models import Subscription
-        from django.utils import timezone
-        
-        # Check for active premium or enterprise subscription
-        active_premium_subscription = Subscription.objects.filter(
-            store=store,
-            status__in=['active', 'trialing'],
-            plan__in=['premium', 'enterprise']
-        ).filter(
-            # For trialing, ensure trial hasn't expired
-            ~models.Q(status='trialing', trial_ends_at__lt=timezone.now())
-        ).exists()
-        
-        return active_premium_subscription
+        # Check for active premium or enterprise subscription; for trialing,
+        # ensure trial hasn't expired
+        if self._subscriptions is not None and store.pk == self.instance.pk:
+            subscriptions = self._subscriptions
+        else:
+            subscriptions = _live_subscriptions(store, self.request)
+        return any(
+            plan in ('premium', 'enterprise')
+            and (status == 'active' or not (trial_ends_at and trial_ends_at < self._now))
+            for status, plan, trial_ends_at in subscriptions
+        )
+
 
 # Reuse ListingForm for creating/editing storefront "products" (listings)
 class ProductForm(ListingForm):
     pass
 
-# storefront/forms.py - Add to existing forms
-
-from django import forms
-from .models import StoreReview, Subscription
-from django.core.validators import MinValueValidator, MaxValueValidator
-
 
 class StoreReviewForm(forms.ModelForm):
     class Meta:
@@ -334,37 +371,40 @@ class StoreReviewForm(forms.ModelForm):
         self.fields['comment'].required = True
         self.fields['rating'].required = True
 
+_PLAN_CHOICES = (
+    ('basic', 'Basic - KSh 999/month'),
+    ('premium', 'Premium - KSh 1,999/month'),
+    ('enterprise', 'Enterprise - KSh 4,999/month'),
+)
+
+_CANCEL_REASONS = (
+    ('too_expensive', 'Too expensive'),
+    ('missing_features', 'Missing features'),
+    ('not_using', 'Not using it enough'),
+    ('poor_experience', 'Poor experience'),
+    ('other', 'Other'),
+)
+
+
 class SubscriptionPlanForm(forms.Form):
     """Form for selecting subscription plan"""
-    PLAN_CHOICES = (
-        ('basic', 'Basic - KSh 999/month'),
-        ('premium', 'Premium - KSh 1,999/month'),
-        ('enterprise', 'Enterprise - KSh 4,999/month'),
-    )
+    PLAN_CHOICES = _PLAN_CHOICES
     
     plan = forms.ChoiceField(
-        choices=PLAN_CHOICES,
+        choices=_PLAN_CHOICES,
         widget=forms.RadioSelect,
-        initial='basic'
+        initial='basic',
+        label="Select Plan"
     )
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['plan'].label = "Select Plan"
 
 
 
 class CancelSubscriptionForm(forms.Form):
     """Form for cancelling subscription"""
     reason = forms.ChoiceField(
-        choices=[
-            ('too_expensive', 'Too expensive'),
-            ('missing_features', 'Missing features'),
-            ('not_using', 'Not using it enough'),
-            ('poor_experience', 'Poor experience'),
-            ('other', 'Other')
-        ],
-        widget=forms.Select(attrs={'class': 'form-control'})
+        choices=_CANCEL_REASONS,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label="Reason for cancelling"
     )
     feedback = forms.CharField(
         required=False,
@@ -372,10 +412,6 @@ class CancelSubscriptionForm(forms.Form):
             'rows': 3,
             'class': 'form-control',
             'placeholder': 'Optional feedback...'
-        })
+        }),
+        label="Additional feedback"
     )
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['reason'].label = "Reason for cancelling"
-        self.fields['feedback'].label = "Additional feedback"
@@ -2,7 +2,20 @@
 from django import forms
 from django.core.validators import FileExtensionValidator
 from .models_bulk import BatchJob, ExportJob, ImportTemplate
-from listings.models import Category
+from .utils.catalog import store_categories
+from listings.models import Category, Listing
+
+class StoreProductsField(forms.ModelMultipleChoiceField):
+    """Multiple product picker validated against a queryset in one query.
+
+    Unlike a MultipleChoiceField, no (id, title) choices list has to be
+    built up front. cleaned_data still holds the ids as strings so it can
+    be stored in BatchJob.parameters.
+    """
+
+    def clean(self, value):
+        return [str(product.pk) for product in super().clean(value)]
+
 
 class BulkProductUpdateForm(forms.Form):
     """Form for bulk updating products"""
@@ -21,8 +34,27 @@ class BulkProductUpdateForm(forms.Form):
         ('set', 'Set Exact Value'),
     ]
     
+    # Fields each action needs, with the error shown when one is missing
+    ACTION_REQUIRED_FIELDS = {
+        'update_price': (
+            ('price_value', 'Price value is required'),
+            ('price_update_method', 'Update method is required'),
+        ),
+        'update_stock': (
+            ('stock_value', 'Stock value is required'),
+            ('stock_update_method', 'Update method is required'),
+        ),
+        'update_status': (('new_status', 'New status is required'),),
+        'update_category': (('new_category', 'New category is required'),),
+        'add_tags': (('tags_to_add', 'Tags to add are required'),),
+        'remove_tags': (('tags_to_remove', 'Tags to remove are required'),),
+    }
+    # Required fields for which 0 is a meaningful value
+    ZERO_ALLOWED_FIELDS = frozenset({'stock_value'})
+    
     action = forms.ChoiceField(choices=ACTION_CHOICES, widget=forms.RadioSelect)
-    products = forms.MultipleChoiceField(
+    products = StoreProductsField(
+        queryset=Listing.objects.none(),
         widget=forms.SelectMultiple(attrs={'class': 'select2-multiple', 'style': 'width: 100%'}),
         required=False
     )
@@ -113,60 +145,33 @@ class BulkProductUpdateForm(forms.Form):
         super().__init__(*args, **kwargs)
         self.store = store
         
-        # Set product choices
-        products = store.listings.filter(is_active=True).values_list('id', 'title')
-        self.fields['products'].choices = [(str(p[0]), p[1]) for p in products]
+        # Products are looked up lazily: only submitted ids are queried
+        products = store.listings.filter(is_active=True)
+        self.fields['products'].queryset = products.only('id', 'title')
         
-        # Set category querysets
-        self.fields['new_category'].queryset = Category.objects.filter(
-            listing__store=store
-        ).distinct()
-        self.fields['filter_category'].queryset = Category.objects.filter(
-            listing__store=store
-        ).distinct()
+        # Set category querysets (both fields offer the same store categories)
+        categories = store_categories(store)
+        self.fields['new_category'].queryset = categories
+        self.fields['filter_category'].queryset = categories
         
         # Initialize with store's products if no specific products selected
         if not self.data.get('products'):
-            product_ids = store.listings.filter(is_active=True).values_list('id', flat=True)[:100]
-            self.fields['products'].initial = [str(pid) for pid in product_ids]
+            self.fields['products'].initial = products.values_list('id', flat=True)[:100]
     
     def clean(self):
         cleaned_data = super().clean()
         action = cleaned_data.get('action')
         
         # Validate based on action
-        if action == 'update_price':
-            if not cleaned_data.get('price_value'):
-                self.add_error('price_value', 'Price value is required')
-            if not cleaned_data.get('price_update_method'):
-                self.add_error('price_update_method', 'Update method is required')
-        
-        elif action == 'update_stock':
-            if cleaned_data.get('stock_value') is None:
-                self.add_error('stock_value', 'Stock value is required')
-            if not cleaned_data.get('stock_update_method'):
-                self.add_error('stock_update_method', 'Update method is required')
-        
-        elif action == 'update_status':
-            if not cleaned_data.get('new_status'):
-                self.add_error('new_status', 'New status is required')
-        
-        elif action == 'update_category':
-            if not cleaned_data.get('new_category'):
-                self.add_error('new_category', 'New category is required')
-        
-        elif action == 'add_tags':
-            if not cleaned_data.get('tags_to_add'):
-                self.add_error('tags_to_add', 'Tags to add are required')
-        
-        elif action == 'remove_tags':
-            if not cleaned_data.get('tags_to_remove'):
-                self.add_error('tags_to_remove', 'Tags to remove are required')
+        for field, message in self.ACTION_REQUIRED_FIELDS.get(action, ()):
+            value = cleaned_data.get(field)
+            if value is None or (not value and field not in self.ZERO_ALLOWED_FIELDS):
+                self.add_error(field, message)
         
         # Validate price range
         price_min = cleaned_data.get('filter_price_min')
         price_max = cleaned_data.get('filter_price_max')
-        if price_min and price_max and price_min > price_max:
+        if price_min is not None and price_max is not None and price_min > price_max:
             self.add_error('filter_price_max', 'Maximum price must be greater than minimum price')
         
         return cleaned_data
@@ -292,7 +297,7 @@ class TemplateForm(forms.ModelForm):
                 name=name,
                 template_type=template_type
             )
-            if self.instance:
+            if self.instance.pk:
                 qs = qs.exclude(pk=self.instance.pk)
             
             if qs.exists():
@@ -363,7 +368,10 @@ class BulkImportForm(forms.ModelForm):
         # Set template queryset to store's templates
         self.fields['template'] = forms.ModelChoiceField(
             label="Use Template (Optional)",
-            queryset=ImportTemplate.objects.filter(store=store, is_active=True),
+            # Option labels only need name and template_type; skip the JSON columns
+            queryset=ImportTemplate.objects.filter(store=store, is_active=True).only(
+                'id', 'name', 'template_type'
+            ),
             required=False,
             empty_label="Select a template...",
             widget=forms.Select(attrs={'class': 'form-control'})
@@ -1,8 +1,33 @@
 # storefront/forms_bundles.py
 from django import forms
 from .models_bundles import ProductBundle, BundleItem, BundleRule, UpsellProduct, ProductTemplate
-from listings.models import Listing, Category
-from django.utils import timezone
+from listings.models import Listing
+from .utils.catalog import store_categories
+from .utils.db import safe_db_query
+from django.core.cache import cache
+
+
+def _next_bundle_sku(store):
+    """Suggest the next ``BUNDLE-<store>-<n>`` SKU, one past the highest in use.
+
+    The highest suffix is cached per store until a bundle is saved, so
+    rendering the form does not use up numbers. The model's unique
+    constraint still guards saves.
+    """
+    key = ProductBundle.sku_seq_cache_key(store.id)
+    last = cache.get(key)
+    if last is None:
+        prefix = f'BUNDLE-{store.id}-'
+        # Suffixes are zero-padded, so the greatest SKU has the highest number
+        latest = safe_db_query(
+            lambda: ProductBundle.objects.filter(
+                store_id=store.id, sku__regex=rf'^{prefix}[0-9]{{6}}$'
+            ).order_by('-sku').values_list('sku', flat=True).first(),
+            default=None,
+        )
+        last = int(latest[len(prefix):]) if latest else 0
+        cache.set(key, last, None)
+    return f"BUNDLE-{store.id}-{last + 1:06d}"
 
 class ProductBundleForm(forms.ModelForm):
     """Form for creating/editing product bundles"""
@@ -23,9 +48,9 @@ class ProductBundleForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.store = store
         
-        # Auto-generate SKU if empty
-        if not self.instance.sku:
-            self.initial['sku'] = f"BUNDLE-{store.id}-{timezone.now().strftime('%Y%m%d')}"
+        # Suggest a SKU when rendering a bundle without one
+        if not self.is_bound and not self.instance.sku:
+            self.initial['sku'] = _next_bundle_sku(store)
     
     def clean_bundle_price(self):
         price = self.cleaned_data.get('bundle_price')
@@ -53,17 +78,20 @@ class BundleItemForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.bundle = bundle
         
+        # Products already in the bundle, read once for the queryset and clean_product
+        self._existing_product_ids = set(bundle.items.values_list('product_id', flat=True))
+        
         # Only show products from the same store
         self.fields['product'].queryset = Listing.objects.filter(
             store=bundle.store,
             is_active=True
         ).exclude(
-            id__in=bundle.items.values_list('product_id', flat=True)
-        )
+            id__in=self._existing_product_ids
+        ).only('id', 'title')
     
     def clean_product(self):
         product = self.cleaned_data.get('product')
-        if product and BundleItem.objects.filter(bundle=self.bundle, product=product).exists():
+        if product and product.pk in self._existing_product_ids:
             raise forms.ValidationError("This product is already in the bundle")
         return product
 
@@ -182,14 +210,12 @@ class ProductTemplateForm(forms.ModelForm):
         self.store = store
         self.user = user
         
-        self.fields['category'].queryset = Category.objects.filter(
-            listing__store=store
-        ).distinct()
+        self.fields['category'].queryset = store_categories(store)
     
     def clean_default_tags(self):
         tags = self.cleaned_data.get('default_tags', '')
         if isinstance(tags, str):
-            return [tag.strip() for tag in tags.split(',') if tag.strip()]
+            return [tag for tag in (part.strip() for part in tags.split(',')) if tag]
         return tags
     
     def save(self, commit=True):
@@ -25,13 +25,11 @@ class ProductVariantForm(forms.ModelForm):
     class Meta:
         model = ProductVariant
         fields = ['name', 'value', 'sku', 'price_adjustment', 'stock', 'weight', 'dimensions', 'is_active']
-    
-    def clean_sku(self):
-        sku = self.cleaned_data.get('sku')
-        if sku:
-            if ProductVariant.objects.filter(sku=sku).exclude(pk=self.instance.pk if self.instance else None).exists():
-                raise forms.ValidationError('SKU already exists')
-        return sku
+        # ProductVariant.sku is unique=True, so ModelForm.validate_unique
+        # already checks it (once) against the database's unique index
+        error_messages = {
+            'sku': {'unique': 'SKU already exists'},
+        }
 
 class StockAdjustmentForm(forms.ModelForm):
     adjustment_type = forms.ChoiceField(
@@ -53,6 +51,8 @@ class StockAdjustmentForm(forms.ModelForm):
     def __init__(self, store, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['product'].queryset = Listing.objects.filter(store=store)
+        # Variant options are loaded in the browser from get_product_variants;
+        # the queryset only has to validate the submitted variant
         self.fields['variant'].queryset = ProductVariant.objects.none()
         
         if 'product' in self.data:
@@ -62,7 +62,10 @@ class StockAdjustmentForm(forms.ModelForm):
             except (ValueError, TypeError):
                 pass
         elif self.instance.pk:
-            self.fields['variant'].queryset = self.instance.product.variants.all()
+            # Filter on the FK column so the product row itself isn't fetched
+            self.fields['variant'].queryset = ProductVariant.objects.filter(
+                listing_id=self.instance.product_id
+            )
 
 class InventoryAuditForm(forms.ModelForm):
     class Meta:
@@ -106,9 +109,7 @@ class BulkStockUpdateForm(forms.Form):
     
     def __init__(self, store, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        from listings.models import Category
-        self.fields['category'].queryset = Category.objects.filter(
-            listing__store=store
-        ).distinct()
+        from .utils.catalog import store_categories
+        self.fields['category'].queryset = store_categories(store)
         from listings.models import Listing
         self.fields['selected_products'].queryset = Listing.objects.filter(store=store)
\ No newline at end of file
@@ -1,7 +1,12 @@
 # storefront/forms_subscription.py
+import re
+
 from django import forms
 from django.core.validators import RegexValidator
 
+# Local M-Pesa number without the +254 prefix; compiled once at import
+_LOCAL_PHONE_RE = re.compile(r'^[0-9]{9}$')
+
 class SubscriptionPlanForm(forms.Form):
     PLAN_CHOICES = (
         ('basic', 'Basic - KSh 999/month'),
@@ -17,7 +22,7 @@ class SubscriptionPlanForm(forms.Form):
 
 class PhoneNumberForm(forms.Form):
     phone_regex = RegexValidator(
-        regex=r'^[0-9]{9}$',
+        regex=_LOCAL_PHONE_RE,
         message="Phone number must be 9 digits without +254 (e.g., 712345678)"
     )
     
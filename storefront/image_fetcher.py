@@ -1,5 +1,7 @@
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.utils.text import slugify
@@ -17,76 +19,94 @@ WIKIMEDIA_HEADERS = {
 }
 ALLOWED_IMAGE_MIME_PREFIX = 'image/'
 GENERATED_IMAGE_SIZE = (1200, 900)
+# Fetched images are downscaled to fit this box before upload
+FETCHED_IMAGE_MAX_SIZE = (1600, 1600)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _build_wikimedia_session():
+    """Create a keep-alive, lightly retrying session for Wikimedia requests."""
+    retry = Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(WIKIMEDIA_HEADERS)
+    return session
+
+
+# Shared so the API search and image downloads of a bulk import reuse
+# pooled connections instead of a new TCP/TLS handshake per request
+_session = _build_wikimedia_session()
 
 
 def search_wikimedia_images(query, max_results=3):
     """Search Wikimedia Commons file namespace for images matching query.
-    Returns list of dicts with keys: title, pageid
+    Uses the search as a generator so image info comes back in the same
+    request. Returns page dicts (title, pageid, imageinfo) in search rank order.
     """
-    params = {
-        'action': 'query',
-        'list': 'search',
-        'format': 'json',
-        'srsearch': query,
-        'srnamespace': 6,  # File namespace
-        'srlimit': max_results,
-    }
-    try:
-        r = requests.get(WIKIMEDIA_API, params=params, headers=WIKIMEDIA_HEADERS, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        hits = data.get('query', {}).get('search', [])
-        return hits
-    except Exception as e:
-        logger.warning('Wikimedia search failed for %s: %s', query, e)
-        return []
-
-
-def get_imageinfo_for_pageids(pageids):
     params = {
         'action': 'query',
         'format': 'json',
+        'generator': 'search',
+        'gsrsearch': query,
+        'gsrnamespace': 6,  # File namespace
+        'gsrlimit': max_results,
         'prop': 'imageinfo',
         'iiprop': 'url|mime|size',
-        'pageids': '|'.join(str(p) for p in pageids)
     }
     try:
-        r = requests.get(WIKIMEDIA_API, params=params, headers=WIKIMEDIA_HEADERS, timeout=10)
+        r = _session.get(WIKIMEDIA_API, params=params, timeout=10)
         r.raise_for_status()
-        return r.json().get('query', {}).get('pages', {})
+        pages = r.json().get('query', {}).get('pages', {})
+        return sorted(pages.values(), key=lambda page: page.get('index', 0))
     except Exception as e:
-        logger.warning('Wikimedia imageinfo fetch failed: %s', e)
-        return {}
+        logger.warning('Wikimedia search failed for %s: %s', query, e)
+        return []
 
 
 def download_image(url, max_bytes=5 * 1024 * 1024):
     """Download image bytes with a size limit."""
     try:
-        r = requests.get(url, stream=True, headers=WIKIMEDIA_HEADERS, timeout=15)
-        r.raise_for_status()
-        content_type = (r.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
-        if content_type and not content_type.startswith(ALLOWED_IMAGE_MIME_PREFIX):
-            logger.debug('Skipping non-image URL %s with content type %s', url, content_type)
-            return None
-        content_length = r.headers.get('Content-Length')
-        if content_length:
-            try:
-                if int(content_length) > max_bytes:
+        # Always release the connection, including when the body is
+        # abandoned early (non-image or oversized responses)
+        with _session.get(url, stream=True, timeout=15) as r:
+            r.raise_for_status()
+            content_type = (r.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
+            if content_type and not content_type.startswith(ALLOWED_IMAGE_MIME_PREFIX):
+                logger.debug('Skipping non-image URL %s with content type %s', url, content_type)
+                return None
+            expected = 0
+            content_length = r.headers.get('Content-Length')
+            if content_length:
+                try:
+                    expected = max(int(content_length), 0)
+                except (TypeError, ValueError):
+                    pass
+                if expected > max_bytes:
                     logger.debug('Skipping oversized image %s (%s bytes)', url, content_length)
                     return None
-            except (TypeError, ValueError):
-                pass
-        content = BytesIO()
-        total = 0
-        for chunk in r.iter_content(8192):
-            if not chunk:
-                break
-            total += len(chunk)
-            if total > max_bytes:
-                logger.debug('Skipping oversized image %s after reading %s bytes', url, total)
-                return None
-            content.write(chunk)
-        return content.getvalue()
+            # Size the buffer from the declared length so it is filled in
+            # place; slice assignment still grows it if the body runs longer
+            content = bytearray(expected)
+            total = 0
+            for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                if not chunk:
+                    break
+                end = total + len(chunk)
+                if end > max_bytes:
+                    logger.debug('Skipping oversized image %s after reading %s bytes', url, end)
+                    return None
+                content[total:end] = chunk
+                total = end
+            del content[total:]
+            return bytes(content)
     except Exception as e:
         logger.warning('Failed to download image %s: %s', url, e)
         return None
@@ -102,6 +122,30 @@ def validate_image_bytes(img_bytes):
         return False
 
 
+def prepare_image_bytes(img_bytes, max_size=FETCHED_IMAGE_MAX_SIZE, quality=85):
+    """Decode fetched image bytes once, downscale them and re-encode as JPEG.
+
+    Returns the JPEG bytes, or None when the bytes are not a decodable
+    image. For JPEG sources thumbnail() decodes in draft mode, so large
+    photos are never decoded at full resolution.
+    """
+    try:
+        with Image.open(BytesIO(img_bytes)) as im:
+            im.thumbnail(max_size)
+            if im.mode in ('RGBA', 'LA') or (im.mode == 'P' and 'transparency' in im.info):
+                rgba = im.convert('RGBA')
+                flattened = Image.new('RGB', rgba.size, 'white')
+                flattened.paste(rgba, mask=rgba.getchannel('A'))
+            else:
+                flattened = im.convert('RGB')
+        output = BytesIO()
+        flattened.save(output, format='JPEG', quality=quality, optimize=True)
+        return output.getvalue()
+    except Exception as e:
+        logger.debug('Invalid image bytes: %s', e)
+        return None
+
+
 def save_image_to_listing(listing: Listing, img_bytes: bytes, filename=None, caption=None):
     try:
         if not filename:
@@ -230,17 +274,9 @@ def fetch_and_attach(listing: Listing, query: str, max_results=3):
     Returns ListingImage or None.
     """
     try:
-        hits = search_wikimedia_images(query, max_results=max_results)
-        if not hits:
-            return None
-        pageids = [h.get('pageid') for h in hits if h.get('pageid')]
-        pages = get_imageinfo_for_pageids(pageids)
-        # iterate pages in order of hits
-        for h in hits:
-            pid = str(h.get('pageid'))
-            page = pages.get(pid)
-            if not page:
-                continue
+        pages = search_wikimedia_images(query, max_results=max_results)
+        # pages come back in search rank order
+        for page in pages:
             iinfo = page.get('imageinfo')
             if not iinfo:
                 continue
@@ -254,7 +290,9 @@ def fetch_and_attach(listing: Listing, query: str, max_results=3):
             img_bytes = download_image(url)
             if not img_bytes:
                 continue
-            if not validate_image_bytes(img_bytes):
+            # Validates and shrinks in one decode; saved under a .jpg name
+            img_bytes = prepare_image_bytes(img_bytes)
+            if not img_bytes:
                 continue
             caption = page.get('title')
             li = save_image_to_listing(listing, img_bytes, filename=None, caption=caption)
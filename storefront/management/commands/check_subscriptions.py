@@ -13,9 +13,9 @@ class Command(BaseCommand):
         self.stdout.write('Checking subscription statuses...')
         
         # Check for expired trials
-        SubscriptionService.check_trial_expiry()
+        SubscriptionService.enforce_trial_expiry()
         
         # Check for expired subscriptions
-        SubscriptionService.check_subscription_expiry()
+        SubscriptionService.enforce_subscription_expiry()
         
-        self.stdout.write(self.style.SUCCESS('Successfully checked subscriptions'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Successfully checked subscriptions'))
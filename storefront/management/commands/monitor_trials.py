@@ -1,9 +1,10 @@
 # storefront/management/commands/monitor_trials.py
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef, Q
 from django.contrib.auth import get_user_model
 from storefront.subscription_service import SubscriptionService
+from storefront.models import Subscription
 from storefront.models_trial import UserTrial
 from datetime import timedelta
 import logging
@@ -32,18 +33,23 @@ class Command(BaseCommand):
     
     def update_trial_stats(self):
         """Update trial usage statistics"""
-        User = get_user_model()
-        
-        # Get users with multiple trials
-        users_with_multiple_trials = User.objects.annotate(
-            trial_count=Count('trials')
+        # Get users with multiple trials (grouped on UserTrial, no User join;
+        # order_by() clears Meta.ordering so it stays out of the GROUP BY)
+        users_with_multiple_trials = UserTrial.objects.order_by().values(
+            'user_id'
+        ).annotate(
+            trial_count=Count('id')
         ).filter(
             trial_count__gt=1
         ).count()
         
         # Get conversion rate
-        total_trials = UserTrial.objects.count()
-        converted_trials = UserTrial.objects.filter(status='converted').count()
+        totals = UserTrial.objects.aggregate(
+            total=Count('id'),
+            converted=Count('id', filter=Q(status='converted'))
+        )
+        total_trials = totals['total']
+        converted_trials = totals['converted']
         conversion_rate = (converted_trials / total_trials * 100) if total_trials > 0 else 0
         
         logger.info(
@@ -56,25 +62,26 @@ class Command(BaseCommand):
         """Flag potential trial abuse"""
         User = get_user_model()
         
-        # Find users creating new accounts for trials
+        # Find users creating new accounts for trials; whether they have a
+        # paid subscription is resolved in the same query
+        paid_subscriptions = Subscription.objects.filter(
+            store__owner=OuterRef('pk'),
+            status='active',
+            trial_ends_at__isnull=True
+        )
         suspicious_users = User.objects.filter(
             date_joined__gte=timezone.now() - timedelta(days=30)
         ).annotate(
-            trial_count=Count('trials')
+            trial_count=Count('trials'),
+            has_paid=Exists(paid_subscriptions)
         ).filter(
             trial_count__gte=1
         ).order_by('date_joined')
         
         for user in suspicious_users[:10]:  # Top 10 suspicious
-            # Check if user has any paid subscriptions
-            has_paid = user.stores.filter(
-                subscriptions__status='active',
-                subscriptions__trial_ends_at__isnull=True
-            ).exists()
-            
-            if not has_paid:
+            if not user.has_paid:
                 logger.warning(
                     f"Suspicious user detected: {user.email} "
                     f"joined {user.date_joined.strftime('%Y-%m-%d')}, "
                     f"has {user.trial_count} trial(s), no paid subscriptions"
-                )
\ No newline at end of file
+                )
@@ -1,119 +1,165 @@
+from celery import group
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
 from django.utils import timezone
-from storefront.models import Subscription, MpesaPayment
-from storefront.mpesa import MpesaGateway
+from django.utils.dateparse import parse_datetime
+from listings.models import Listing
+from storefront.models import Store, Subscription, MpesaPayment
+from storefront.tasks import initiate_subscription_renewal
+from storefront.utils.subscription_utils import lock_stores_except_first
 from datetime import timedelta
 
+# Rows fetched per round-trip when streaming the sweeps
+ITERATOR_CHUNK_SIZE = 2000
+
+# A subscription gets at most one renewal STK push per interval
+RENEWAL_RETRY_INTERVAL = timedelta(days=1)
+
 class Command(BaseCommand):
     help = 'Process subscription renewals and trial expirations'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-renewals', action='store_true', help='Run every sweep except renewals')
+        parser.add_argument('--renewals-only', action='store_true', help='Only run the renewal sweep')
+
     def handle(self, *args, **options):
+        if options['renewals_only']:
+            self.process_renewals()
+            return
         self.process_trial_expirations()
-        self.process_renewals()
+        if not options['skip_renewals']:
+            self.process_renewals()
         self.handle_past_due_subscriptions()
 
     def process_trial_expirations(self):
         """Process expired trials that haven't converted to paid subscriptions"""
+        now = timezone.now()
+        # Rows locked by another worker running this sweep are left to it
         expired_trials = Subscription.objects.filter(
             status='trialing',
-            trial_ends_at__lte=timezone.now()
+            trial_ends_at__lte=now
+        ).select_related('store').select_for_update(skip_locked=True, of=('self',)).annotate(
+            # Check for a successful payment in the same query
+            has_payment=Exists(MpesaPayment.objects.filter(
+                subscription=OuterRef('pk'),
+                status='completed'
+            ))
         )
 
-        for subscription in expired_trials:
-            # Check if there's a successful payment
-            has_payment = MpesaPayment.objects.filter(
-                subscription=subscription,
-                status='completed'
-            ).exists()
+        with transaction.atomic():
+            # Stream the backlog; cancellations only need the ids
+            to_activate = []
+            cancel_ids = []
+            cancel_store_ids = set()
+            cancel_owner_ids = set()
+            for subscription in expired_trials.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+                if subscription.has_payment:
+                    to_activate.append(subscription)
+                else:
+                    cancel_ids.append(subscription.id)
+                    cancel_store_ids.add(subscription.store_id)
+                    cancel_owner_ids.add(subscription.store.owner_id)
 
-            if not has_payment:
+            if cancel_ids:
                 # No payment made during trial - deactivate
-                subscription.status = 'cancelled'
-                subscription.save()
+                Subscription.objects.filter(
+                    id__in=cancel_ids
+                ).update(status='canceled', trial_ended_at=now, updated_at=now)
 
-                # Lock stores for the owner except the first created store
+                # update() skips Subscription.save(), so un-feature the stores left
+                # without a premium plan the way _update_featured_status() would
+                premium = Subscription.objects.filter(
+                    store=OuterRef('pk'),
+                    plan__in=['premium', 'enterprise']
+                ).filter(
+                    Q(status='active') | Q(status='trialing', trial_ends_at__gt=now)
+                )
+                unfeatured_ids = list(Store.objects.filter(
+                    id__in=cancel_store_ids
+                ).exclude(Exists(premium)).values_list('id', flat=True))
+                Store.objects.filter(id__in=unfeatured_ids).update(is_featured=False)
+                Listing.objects.filter(store_id__in=unfeatured_ids).update(is_featured=False)
+
+                # Lock stores for the owners except each owner's first created store
                 try:
-                    owner = subscription.store.owner
-                    from storefront.models import Store
-                    from listings.models import Listing
-
-                    owner_stores = Store.objects.filter(owner=owner).order_by('created_at')
-                    first = owner_stores.first()
-                    # Deactivate all other stores and their listings
-                    for s in owner_stores:
-                        if first and s.id == first.id:
-                            # Ensure the first store remains active but not premium
-                            s.is_premium = False
-                            s.is_active = True
-                            s.save()
-                            continue
-                        s.is_premium = False
-                        s.is_active = False
-                        s.save()
-                        # Disable all listings for this store
-                        Listing.objects.filter(store=s).update(is_active=False)
+                    with transaction.atomic():
+                        lock_stores_except_first(cancel_owner_ids)
                 except Exception as e:
                     print(f"Error locking stores after trial expiry: {e}")
-            else:
+
+            if to_activate:
                 # Payment received - convert to active
-                subscription.status = 'active'
-                subscription.next_billing_date = timezone.now() + timedelta(days=30)
-            
-            subscription.save()
+                Subscription.objects.filter(
+                    id__in=[subscription.id for subscription in to_activate]
+                ).update(
+                    status='active',
+                    current_period_end=now + timedelta(days=30),
+                    trial_ended_at=now,
+                    updated_at=now,
+                )
+                for subscription in to_activate:
+                    subscription.status = 'active'
+                    subscription._update_featured_status()
 
     def process_renewals(self):
         """Process subscription renewals"""
+        # Phone number of the last successful payment, fetched with the subscription
+        last_phone = MpesaPayment.objects.filter(
+            subscription=OuterRef('pk'),
+            status='completed'
+        ).order_by('-transaction_date').values('phone_number')[:1]
+        now = timezone.now()
+        # A renewal push still awaiting the customer's PIN or its callback
+        recent_pending = MpesaPayment.objects.filter(
+            subscription=OuterRef('pk'),
+            status='pending',
+            created_at__gt=now - RENEWAL_RETRY_INTERVAL
+        )
         due_for_renewal = Subscription.objects.filter(
             status='active',
-            next_billing_date__lte=timezone.now()
-        )
+            current_period_end__lte=now
+        ).exclude(Exists(recent_pending)).select_for_update(skip_locked=True).annotate(
+            last_phone=Subquery(last_phone)
+        ).exclude(last_phone=None)
 
-        mpesa = MpesaGateway()
+        with transaction.atomic():
+            renewing = []
+            for subscription in due_for_renewal.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+                requested_at = parse_datetime(subscription.metadata.get('renewal_requested_at') or '')
+                if requested_at and requested_at > now - RENEWAL_RETRY_INTERVAL:
+                    continue
+                # Stamp the row while it is locked so a concurrent or later sweep skips it
+                subscription.metadata['renewal_requested_at'] = now.isoformat()
+                subscription.updated_at = now
+                renewing.append(subscription)
 
-        for subscription in due_for_renewal:
-            # Get last successful payment to get phone number
-            last_payment = subscription.payments.filter(status='completed').order_by('-transaction_date').first()
-            
-            if last_payment:
-                try:
-                    # Initiate renewal payment
-                    phone_norm = mpesa._normalize_phone(last_payment.phone_number)
-                    response = mpesa.initiate_stk_push(
-                        phone=phone_norm,
-                        amount=999,
-                        account_reference=f"Store-{subscription.store.id}-Renewal"
-                    )
-
-                    # Create new payment record
-                    MpesaPayment.objects.create(
-                        subscription=subscription,
-                        checkout_request_id=response['CheckoutRequestID'],
-                        merchant_request_id=response['MerchantRequestID'],
-                        phone_number=phone_norm,
-                        amount=999,
-                        status='pending'
-                    )
-
-                except Exception as e:
-                    # Mark as past due if payment initiation fails
-                    subscription.status = 'past_due'
-                    subscription.save()
-                    print(f"Failed to initiate renewal for subscription {subscription.id}: {str(e)}")
+            if renewing:
+                Subscription.objects.bulk_update(
+                    renewing, ['metadata', 'updated_at'], batch_size=ITERATOR_CHUNK_SIZE
+                )
+                renewals = [
+                    initiate_subscription_renewal.s(subscription.id, subscription.last_phone, subscription.store_id)
+                    for subscription in renewing
+                ]
+                # Each STK push is a gateway round-trip; send them concurrently from the workers
+                transaction.on_commit(group(renewals).apply_async)
 
     def handle_past_due_subscriptions(self):
         """Handle subscriptions that are past due"""
         grace_period = timezone.now() - timedelta(days=7)  # 7 day grace period
         past_due_subs = Subscription.objects.filter(
             status='past_due',
-            next_billing_date__lte=grace_period
-        )
+            current_period_end__lte=grace_period
+        ).select_related('store').select_for_update(skip_locked=True, of=('self',))
 
-        for subscription in past_due_subs:
-            # After grace period, cancel subscription and remove premium status
-            subscription.status = 'cancelled'
-            subscription.cancelled_at = timezone.now()
-            subscription.save()
+        with transaction.atomic():
+            for subscription in past_due_subs.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+                # After grace period, cancel subscription and remove premium status
+                subscription.status = 'canceled'
+                subscription.canceled_at = timezone.now()
+                subscription.save()
 
-            store = subscription.store
-            store.is_premium = False
-            store.save()
\ No newline at end of file
+                store = subscription.store
+                store.is_premium = False
+                store.save()
\ No newline at end of file
@@ -14,8 +14,11 @@ class Command(BaseCommand):
             self.stdout.write('Today is not Thursday; skipping processing')
             return
 
-        pending = WithdrawalRequest.objects.filter(status='scheduled', scheduled_for__lte=now)
-        self.stdout.write(f'Processing {pending.count()} withdrawals')
+        # process() reads the store's payout details for every row
+        pending = list(
+            WithdrawalRequest.objects.filter(status='scheduled', scheduled_for__lte=now).select_related('store')
+        )
+        self.stdout.write(f'Processing {len(pending)} withdrawals')
         for w in pending:
             ok = w.process()
             self.stdout.write(f'{w.id}: processed={ok} status={w.status}')
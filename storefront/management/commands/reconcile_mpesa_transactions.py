@@ -1,19 +1,81 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.signals import post_save
 from django.utils import timezone
 from datetime import timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Payments loaded, polled and finalized together
+BATCH_SIZE = 500
+
+# Order payment columns written when a payment is finalized
+ORDER_PAYMENT_FIELDS = ['status', 'mpesa_result_code', 'mpesa_result_desc', 'mpesa_callback_data']
+
 
 class Command(BaseCommand):
     help = 'Reconcile pending M-Pesa STK transactions by querying Safaricom API'
 
     def add_arguments(self, parser):
         parser.add_argument('--minutes', type=int, default=2, help='Consider payments older than this many minutes')
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent Safaricom status queries')
+
+    def _batches(self, queryset):
+        """Stream a queryset in lists of BATCH_SIZE rows, so memory stays bounded on large backlogs."""
+        rows = queryset.iterator(chunk_size=BATCH_SIZE)
+        while batch := list(islice(rows, BATCH_SIZE)):
+            yield batch
+
+    @staticmethod
+    def _succeeded(result_code):
+        """M-Pesa reports success as result code 0; an empty code is treated the same."""
+        return result_code in ('0', '') or int(result_code) == 0
+
+    def _write_summary(self, label, outcomes):
+        """Report one line per section; per-payment detail goes to the debug log."""
+        self.stdout.write(
+            f"{label}: checked={outcomes['checked']} completed={outcomes['completed']} "
+            f"failed={outcomes['failed']} already_finalized={outcomes['already_finalized']} "
+            f"no_status={outcomes['no_status']}"
+        )
+
+    @staticmethod
+    def _send_post_save(instance, fields):
+        """Run the post_save receivers for a row finalized by a conditional update().
+
+        update() sends no signals, but the receivers (owner e-mails, affiliate
+        commissions, order webhooks, delivery requests) must see the result.
+        """
+        instance.refresh_from_db(fields=fields)
+        post_save.send(
+            sender=type(instance), instance=instance, created=False,
+            update_fields=frozenset(fields), raw=False, using=instance._state.db,
+        )
+
+    def _query_statuses(self, gateway, checkouts, workers):
+        """Query Safaricom for each checkout concurrently; results are keyed by checkout id.
+
+        Only the HTTP calls run in the pool, database writes stay on the calling thread.
+        """
+        def query(checkout):
+            try:
+                return gateway.check_transaction_status(checkout)
+            except Exception as e:
+                logger.exception(f"Error querying M-Pesa status for {checkout}: {e}")
+                return {'success': False, 'error': str(e)}
+
+        if not checkouts:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return dict(zip(checkouts, pool.map(query, checkouts)))
 
     def handle(self, *args, **options):
         minutes = options.get('minutes', 2)
+        workers = options.get('workers', 8)
         from storefront.mpesa_webhook import logger as webhook_logger
         from listings.mpesa_utils import mpesa_gateway
 
@@ -22,70 +84,95 @@ class Command(BaseCommand):
         # Reconcile subscription payments
         from storefront.models import MpesaPayment
         subs = MpesaPayment.objects.filter(status='pending', created_at__lte=cutoff)
-        self.stdout.write(f"Reconciling {subs.count()} subscription payments...")
-        for p in subs:
-            try:
-                checkout = p.checkout_request_id
-                res = mpesa_gateway.check_transaction_status(checkout)
-                if not res.get('success'):
-                    self.stdout.write(f"No status for {checkout}: {res.get('error')}")
-                    continue
-                result_code = res.get('result_code')
-                if str(result_code) in ['0', ''] or int(result_code) == 0:
-                    p.status = 'completed'
-                    p.result_code = str(result_code)
-                    p.result_description = res.get('result_desc')
-                    p.raw_response = res.get('response_data') or p.raw_response
-                    p.save()
-                    self.stdout.write(f"Marked subscription payment {p.id} completed")
-                else:
-                    p.status = 'failed'
-                    p.result_code = str(result_code)
-                    p.result_description = res.get('result_desc')
-                    p.raw_response = res.get('response_data') or p.raw_response
-                    p.save()
-                    self.stdout.write(f"Marked subscription payment {p.id} failed: {result_code}")
-            except Exception as e:
-                webhook_logger.exception(f"Error reconciling subscription payment {p.id}: {e}")
+        outcomes = Counter()
+        for batch in self._batches(subs):
+            outcomes['checked'] += len(batch)
+            statuses = self._query_statuses(mpesa_gateway, [p.checkout_request_id for p in batch], workers)
+            for p in batch:
+                try:
+                    checkout = p.checkout_request_id
+                    res = statuses[checkout]
+                    if not res.get('success'):
+                        logger.debug('No status for %s: %s', checkout, res.get('error'))
+                        outcomes['no_status'] += 1
+                        continue
+                    result_code = str(res.get('result_code'))
+                    new_status = 'completed' if self._succeeded(result_code) else 'failed'
+                    # Only finalize a payment that is still pending; the webhook or an
+                    # overlapping run may have settled it since it was queried
+                    claimed = MpesaPayment.objects.filter(pk=p.pk, status='pending').update(
+                        status=new_status,
+                        result_code=result_code,
+                        result_description=res.get('result_desc'),
+                        raw_response=res.get('response_data') or p.raw_response,
+                        updated_at=timezone.now(),
+                    )
+                    if not claimed:
+                        logger.debug('Subscription payment %s already finalized', p.id)
+                        outcomes['already_finalized'] += 1
+                    else:
+                        self._send_post_save(p, ['status', 'result_code', 'result_description', 'raw_response', 'updated_at'])
+                        logger.debug('Marked subscription payment %s %s (result %s)', p.id, new_status, result_code)
+                        outcomes[new_status] += 1
+                except Exception as e:
+                    webhook_logger.exception(f"Error reconciling subscription payment {p.id}: {e}")
+        self._write_summary('Subscription payments', outcomes)
 
         # Reconcile order payments
         from listings.models import Payment as OrderPayment
         orders = OrderPayment.objects.filter(status='initiated', mpesa_checkout_request_id__isnull=False, created_at__lte=cutoff)
-        self.stdout.write(f"Reconciling {orders.count()} order payments...")
-        for op in orders:
-            try:
-                checkout = op.mpesa_checkout_request_id
-                res = mpesa_gateway.check_transaction_status(checkout)
-                if not res.get('success'):
-                    self.stdout.write(f"No status for {checkout}: {res.get('error')}")
-                    continue
-                result_code = res.get('result_code')
-                if str(result_code) in ['0', ''] or int(result_code) == 0:
-                    # extract receipt if available
-                    resp = res.get('response_data') or {}
-                    items = (resp.get('Body', {}).get('stkCallback', {}).get('CallbackMetadata', {}).get('Item', []))
-                    receipt = None
-                    for it in items:
-                        if it.get('Name') in ('MpesaReceiptNumber', 'ReceiptNumber'):
-                            receipt = it.get('Value')
-                    op.status = 'completed'
-                    op.mpesa_result_code = str(result_code)
-                    op.mpesa_result_desc = res.get('result_desc')
-                    op.mpesa_callback_data = resp
-                    op.save()
-                    try:
-                        op.mark_as_completed(transaction_id=receipt or f"MPESA-{checkout}")
-                    except Exception:
-                        op.save()
-                    self.stdout.write(f"Marked order payment {op.id} completed")
-                else:
-                    op.status = 'failed'
-                    op.mpesa_result_code = str(result_code)
-                    op.mpesa_result_desc = res.get('result_desc')
-                    op.mpesa_callback_data = res.get('response_data')
-                    op.save()
-                    self.stdout.write(f"Marked order payment {op.id} failed: {result_code}")
-            except Exception as e:
-                webhook_logger.exception(f"Error reconciling order payment {op.id}: {e}")
+        outcomes = Counter()
+        for batch in self._batches(orders):
+            outcomes['checked'] += len(batch)
+            statuses = self._query_statuses(mpesa_gateway, [op.mpesa_checkout_request_id for op in batch], workers)
+            for op in batch:
+                try:
+                    checkout = op.mpesa_checkout_request_id
+                    res = statuses[checkout]
+                    if not res.get('success'):
+                        logger.debug('No status for %s: %s', checkout, res.get('error'))
+                        outcomes['no_status'] += 1
+                        continue
+                    result_code = str(res.get('result_code'))
+                    if self._succeeded(result_code):
+                        # extract receipt if available
+                        resp = res.get('response_data') or {}
+                        items = resp.get('Body', {}).get('stkCallback', {}).get('CallbackMetadata', {}).get('Item', [])
+                        values = {it.get('Name'): it.get('Value') for it in items}
+                        receipt = values.get('MpesaReceiptNumber') or values.get('ReceiptNumber')
+                        with transaction.atomic():
+                            # Claim and complete the payment in one UPDATE so the
+                            # order is marked paid exactly once
+                            claimed = OrderPayment.objects.filter(pk=op.pk, status='initiated').update(
+                                status='completed',
+                                transaction_id=str(receipt or f"MPESA-{checkout}"),
+                                completed_at=timezone.now(),
+                                mpesa_result_code=result_code,
+                                mpesa_result_desc=res.get('result_desc') or '',
+                                mpesa_callback_data=resp,
+                            )
+                            if claimed:
+                                self._send_post_save(op, ORDER_PAYMENT_FIELDS + ['transaction_id', 'completed_at'])
+                                op.finalize_order()
+                        new_status = 'completed'
+                    else:
+                        claimed = OrderPayment.objects.filter(pk=op.pk, status='initiated').update(
+                            status='failed',
+                            mpesa_result_code=result_code,
+                            mpesa_result_desc=res.get('result_desc') or '',
+                            mpesa_callback_data=res.get('response_data'),
+                        )
+                        if claimed:
+                            self._send_post_save(op, ORDER_PAYMENT_FIELDS)
+                        new_status = 'failed'
+                    if not claimed:
+                        logger.debug('Order payment %s already finalized', op.id)
+                        outcomes['already_finalized'] += 1
+                    else:
+                        logger.debug('Marked order payment %s %s (result %s)', op.id, new_status, result_code)
+                        outcomes[new_status] += 1
+                except Exception as e:
+                    webhook_logger.exception(f"Error reconciling order payment {op.id}: {e}")
+        self._write_summary('Order payments', outcomes)
 
         self.stdout.write("Reconciliation complete.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from storefront.models import Store
+from storefront.utils.store_stats import refresh_store_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached rating, review count and sales count of every store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help='Only refresh the store with this slug')
+
+    def handle(self, *args, **options):
+        stores = Store.objects.all()
+        if options['store']:
+            stores = stores.filter(slug=options['store'])
+        updated = refresh_store_stats(stores)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed stats for {updated} store(s)'))
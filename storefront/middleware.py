@@ -1,32 +1,46 @@
 # storefront/middleware.py
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from functools import partial
 import re
 from .utils.subscription_utils import enforce_expired_trials_for_user
 
 class SubscriptionMiddleware:
+    # Define premium-only URL patterns
+    premium_patterns = [
+        r'^/dashboard/store/[^/]+/bulk/',
+        r'^/dashboard/store/[^/]+/bundles/',
+        r'^/dashboard/store/[^/]+/inventory/(?!list|dashboard)',
+        r'^/dashboard/analytics/advanced/',
+        r'^/dashboard/store/[^/]+/product/create-batch/',
+    ]
+
+    # Define enterprise-only URL patterns
+    enterprise_patterns = [
+        r'^/dashboard/store/[^/]+/analytics/custom/',
+        r'^/api/v1/analytics/',
+        r'^/dashboard/store/[^/]+/api/',
+    ]
+
+    # Each tier is matched with a single alternation compiled once per process
+    premium_re = re.compile('|'.join(f'(?:{pattern})' for pattern in premium_patterns))
+    enterprise_re = re.compile('|'.join(f'(?:{pattern})' for pattern in enterprise_patterns))
+
+    # Seconds between expired-trial checks for the same user
+    TRIAL_ENFORCEMENT_INTERVAL = 60
+
     def __init__(self, get_response):
         self.get_response = get_response
-        # Define premium-only URL patterns
-        self.premium_patterns = [
-            r'^/dashboard/store/[^/]+/bulk/',
-            r'^/dashboard/store/[^/]+/bundles/',
-            r'^/dashboard/store/[^/]+/inventory/(?!list|dashboard)',
-            r'^/dashboard/analytics/advanced/',
-            r'^/dashboard/store/[^/]+/product/create-batch/',
-        ]
-        
-        # Define enterprise-only URL patterns
-        self.enterprise_patterns = [
-            r'^/dashboard/store/[^/]+/analytics/custom/',
-            r'^/api/v1/analytics/',
-            r'^/dashboard/store/[^/]+/api/',
-        ]
-    
+
     def __call__(self, request):
+        # One timestamp per request, shared by the subscription checks here
+        # and in storefront forms (see StoreForm's `now`)
+        request._now = timezone.now()
         response = self.get_response(request)
         return response
     
@@ -41,25 +55,33 @@ class SubscriptionMiddleware:
         if request.user.is_staff:
             return None
 
-        # Enforce any expired trials immediately for this user (locks stores/listings)
+        # Enforce any expired trials for this user (locks stores/listings),
+        # at most once per TRIAL_ENFORCEMENT_INTERVAL
         try:
-            enforce_expired_trials_for_user(request.user)
+            if cache.add(f'trial_enforced:{request.user.pk}', 1, self.TRIAL_ENFORCEMENT_INTERVAL):
+                enforce_expired_trials_for_user(request.user)
         except Exception:
             # Don't block the request if enforcement fails; log later if needed
             pass
         
-        # Get current path
+        # Only premium/enterprise URLs need the store's subscription
         path = request.path
-        
+        is_premium_path = bool(self.premium_re.match(path))
+        is_enterprise_path = bool(self.enterprise_re.match(path))
+        if not (is_premium_path or is_enterprise_path):
+            return None
+
         # Get store slug from URL if available
         store_slug = view_kwargs.get('slug') or view_kwargs.get('store_slug')
         
         # If we're accessing a store-specific page
         if store_slug:
+            from listings.models import Listing
             from .models import Store, Subscription
+            from .tasks import send_trial_expired_notification
             
             try:
-                store = Store.objects.get(slug=store_slug, owner=request.user)
+                store = Store.objects.only('id', 'slug', 'owner_id').get(slug=store_slug, owner=request.user)
                 
                 # Get active subscription
                 subscription = Subscription.objects.filter(
@@ -78,13 +100,22 @@ class SubscriptionMiddleware:
                     
                     # Check trial expiration
                     if is_trialing and subscription.trial_ends_at:
-                        if timezone.now() > subscription.trial_ends_at:
-                            # Trial expired - downgrade to free
+                        if request._now > subscription.trial_ends_at:
+                            # Trial expired - downgrade to free. The conditional
+                            # update only succeeds for the request that ends the trial.
+                            ended = Subscription.objects.filter(
+                                pk=subscription.pk, status='trialing'
+                            ).update(status='canceled', trial_ended_at=request._now, updated_at=request._now)
                             subscription.status = 'canceled'
-                            store.is_premium = False
-                            store.is_featured = False
-                            subscription.save()
-                            store.save()
+                            Store.objects.filter(pk=store.pk).update(is_premium=False, is_featured=False)
+                            if ended:
+                                # The update() above skips Subscription.save(), which
+                                # would otherwise un-feature the store's listings
+                                Listing.objects.filter(store=store).update(is_featured=False)
+                                # Email/SMS the owner off the request path
+                                transaction.on_commit(
+                                    partial(send_trial_expired_notification.delay, subscription.pk)
+                                )
                             has_active_sub = False
                             is_trialing = False
                 
@@ -97,7 +128,7 @@ class SubscriptionMiddleware:
                 }
                 
                 # Check access to premium features
-                if any(re.match(pattern, path) for pattern in self.premium_patterns):
+                if is_premium_path:
                     if not has_active_sub:
                         messages.error(
                             request,
@@ -116,7 +147,7 @@ class SubscriptionMiddleware:
                         return redirect('storefront:subscription_plan_select', slug=store_slug)
                 
                 # Check access to enterprise features
-                if any(re.match(pattern, path) for pattern in self.enterprise_patterns):
+                if is_enterprise_path:
                     if not has_active_sub or plan != 'enterprise':
                         messages.error(
                             request,
@@ -129,6 +160,7 @@ class SubscriptionMiddleware:
         
         return None
     
+from django.db.models import F
 from django.utils.deprecation import MiddlewareMixin
 from .models import Store
 
@@ -138,10 +170,6 @@ class StoreViewMiddleware(MiddlewareMixin):
     def process_view(self, request, view_func, view_args, view_kwargs):
         # Check if this is a store detail view
         if view_func.__name__ == 'store_detail' and 'slug' in view_kwargs:
-            try:
-                store = Store.objects.get(slug=view_kwargs['slug'])
-                # Use the track_view method if you implement session-based tracking
-                store.increment_views()
-            except Store.DoesNotExist:
-                pass
-        return None
\ No newline at end of file
+            # Single atomic UPDATE; no need to load the store or read the count back
+            Store.objects.filter(slug=view_kwargs['slug']).update(total_views=F('total_views') + 1)
+        return None
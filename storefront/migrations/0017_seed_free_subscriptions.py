@@ -1,31 +1,36 @@
 from django.db import migrations, models
 import django.utils.timezone as timezone
 
+SEED_BATCH_SIZE = 1000
+
 
 def create_free_subscriptions(apps, schema_editor):
     Store = apps.get_model('storefront', 'Store')
     Subscription = apps.get_model('storefront', 'Subscription')
     now = timezone.now()
 
-    stores = Store.objects.all()
+    # Stores without any subscription, found in one query
+    missing_ids = list(Store.objects.annotate(
+        has_subscription=models.Exists(Subscription.objects.filter(store=models.OuterRef('pk')))
+    ).filter(has_subscription=False).values_list('id', flat=True))
+
+    # Create zero-amount free subscription rows in batches
     created = 0
-    for store in stores:
-        # Skip if store already has any subscriptions
-        existing = Subscription.objects.filter(store=store).exists()
-        if existing:
-            continue
-
-        # Create a zero-amount free subscription row
-        Subscription.objects.create(
-            store=store,
-            plan='free',
-            status='active',
-            amount=0,
-            currency='KES',
-            started_at=now,
-            metadata={'seeded_free_subscription': True},
-        )
-        created += 1
+    for start in range(0, len(missing_ids), SEED_BATCH_SIZE):
+        batch = missing_ids[start:start + SEED_BATCH_SIZE]
+        Subscription.objects.bulk_create([
+            Subscription(
+                store_id=store_id,
+                plan='free',
+                status='active',
+                amount=0,
+                currency='KES',
+                started_at=now,
+                metadata={'seeded_free_subscription': True},
+            )
+            for store_id in batch
+        ])
+        created += len(batch)
 
     # Optionally log to stdout during migration
     try:
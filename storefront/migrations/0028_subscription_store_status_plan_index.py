@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0027_expand_bulk_job_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['store', 'status', 'plan'], name='storefront__store_i_9a8535_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0028_subscription_store_status_plan_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mpesapayment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='mpesa_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'trialing')), fields=['trial_ends_at'], name='sub_trialing_ends_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['current_period_end'], name='sub_active_period_end_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:18
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Round
+
+
+def backfill_store_stats(apps, schema_editor):
+    # Same single UPDATE as storefront.utils.store_stats, on historical models
+    Store = apps.get_model('storefront', 'Store')
+    StoreReview = apps.get_model('storefront', 'StoreReview')
+    Review = apps.get_model('listings', 'Review')
+    OrderItem = apps.get_model('listings', 'OrderItem')
+
+    def per_store(model, store_lookup, aggregate, output_field):
+        return models.Subquery(
+            model.objects.filter(**{store_lookup: models.OuterRef('pk')})
+            .order_by().values(store_lookup).annotate(value=aggregate).values('value'),
+            output_field=output_field,
+        )
+
+    product_avg = per_store(Review, 'listing__store', models.Avg('rating'), models.FloatField())
+    store_avg = per_store(StoreReview, 'store', models.Avg('rating'), models.FloatField())
+    Store.objects.update(
+        cached_rating=Coalesce(
+            Round((product_avg + store_avg) / 2, 1), Round(product_avg, 1), Round(store_avg, 1), models.Value(0.0),
+        ),
+        cached_store_rating=Coalesce(Round(store_avg, 1), models.Value(0.0)),
+        cached_review_count=(
+            Coalesce(per_store(Review, 'listing__store', models.Count('pk'), models.IntegerField()), models.Value(0))
+            + Coalesce(per_store(StoreReview, 'store', models.Count('pk'), models.IntegerField()), models.Value(0))
+        ),
+        cached_sales_count=Coalesce(
+            per_store(OrderItem, 'listing__store', models.Sum('quantity'), models.IntegerField()), models.Value(0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0029_subscription_mpesapayment_partial_indexes'),
+        ('listings', '0046_order_platform_tax_order_subtotal_order_tax_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='cached_rating',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='cached_review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='cached_sales_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='cached_store_rating',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=3),
+        ),
+        migrations.RunPython(backfill_store_stats, migrations.RunPython.noop),
+    ]
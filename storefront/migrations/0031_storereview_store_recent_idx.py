@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0030_store_cached_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='storereview',
+            index=models.Index(fields=['store', '-created_at', '-id'], name='storereview_store_recent_idx'),
+        ),
+    ]
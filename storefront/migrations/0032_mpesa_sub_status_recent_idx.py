@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0031_storereview_store_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mpesapayment',
+            index=models.Index(fields=['subscription', 'status', '-created_at'], name='mpesa_sub_status_recent_idx'),
+        ),
+    ]
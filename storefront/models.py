@@ -1,19 +1,80 @@
+import logging
+import os
+from collections import defaultdict
+
 from django.conf import settings
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.fields.files import FieldFile
 from django.urls import reverse
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Avg, F
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import F, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta, datetime
 
+
+# Store media goes to Cloudinary when the app is installed and configured
+USE_CLOUDINARY = bool(
+    'cloudinary' in settings.INSTALLED_APPS and getattr(settings, 'CLOUDINARY_CLOUD_NAME', None)
+)
+if USE_CLOUDINARY:
+    from cloudinary.models import CloudinaryField
+
+# Extensions trusted without opening the file (content type is still checked)
+_IMAGE_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.webp'})
+
+# Leading bytes of the formats above; WebP is RIFF....WEBP
+_IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a')
+
+
+def _has_image_signature(head):
+    return head.startswith(_IMAGE_SIGNATURES) or (head[:4] == b'RIFF' and head[8:12] == b'WEBP')
+
+
+def _pending_upload(value):
+    """Return the not-yet-stored upload behind an image field value, or None.
+
+    Values that are already stored (including Cloudinary resources) were
+    validated when they were uploaded, so re-saving a store skips them.
+    """
+    if isinstance(value, UploadedFile):
+        return value
+    if isinstance(value, FieldFile) and not value._committed and isinstance(value.file, UploadedFile):
+        return value.file
+    return None
+
+
+def validate_image_upload(upload, max_bytes):
+    """Reject non-image or oversized uploads without decoding them."""
+    content_type = getattr(upload, 'content_type', None) or ''
+    if not content_type.startswith('image/'):
+        raise ValidationError("Only image files are allowed.")
+    if getattr(upload, 'size', 0) > max_bytes:
+        raise ValidationError(f"Images must be {max_bytes // (1024 * 1024)}MB or smaller.")
+
+    # Common image extension plus an image/* content type: accept as is
+    ext = os.path.splitext(getattr(upload, 'name', '') or '')[1].lower()
+    if ext in _IMAGE_EXTS:
+        return
+
+    # Unknown or missing extension: sniff the header instead of decoding
+    head = upload.read(16)
+    upload.seek(0)
+    if not _has_image_signature(head):
+        raise ValidationError("Upload a valid image file.")
+
+
 class Store(models.Model):
+    MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stores')
     name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True)
     
     # Optional logo and cover image for storefronts
-    if 'cloudinary' in __import__('django.conf').conf.settings.INSTALLED_APPS and hasattr(__import__('django.conf').conf.settings, 'CLOUDINARY_CLOUD_NAME') and __import__('django.conf').conf.settings.CLOUDINARY_CLOUD_NAME:
-        from cloudinary.models import CloudinaryField
+    if USE_CLOUDINARY:
         logo = CloudinaryField('logo', folder='baysoko/stores/logos/', null=True, blank=True)
         cover_image = CloudinaryField('cover_image', folder='baysoko/stores/covers/', null=True, blank=True)
     else:
@@ -37,6 +98,17 @@ class Store(models.Model):
     location_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     location_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     location_place_id = models.CharField(max_length=255, blank=True)
+    # Review and sales figures, kept current by storefront.signals and
+    # rebuilt by the refresh_store_stats command
+    cached_rating = models.DecimalField(max_digits=3, decimal_places=1, default=0)
+    cached_store_rating = models.DecimalField(max_digits=3, decimal_places=1, default=0)
+    cached_review_count = models.PositiveIntegerField(default=0)
+    cached_sales_count = models.PositiveIntegerField(default=0)
+
+    CACHED_STAT_FIELDS = ('cached_rating', 'cached_store_rating', 'cached_review_count', 'cached_sales_count')
+
+    # Seconds a has_user_reviewed() answer is cached
+    REVIEWED_CACHE_TIMEOUT = 300
 
     class Meta:
         ordering = ['-created_at']
@@ -66,16 +138,7 @@ class Store(models.Model):
     
     def get_sales_count(self):
         """Return total sales count for all listings in this store."""
-        from listings.models import OrderItem
-        
-        # Get the sum of quantities from all order items for this store's listings
-        total_quantity = OrderItem.objects.filter(
-            listing__store=self
-        ).aggregate(
-            total_quantity=Sum('quantity')
-        )['total_quantity']
-        
-        return total_quantity or 0
+        return self.cached_sales_count
 
     def can_be_featured(self):
         """Check if store can be featured based on subscription status"""
@@ -119,166 +182,143 @@ class Store(models.Model):
         """
         Return combined average rating for:
         1. Product reviews for all listings in this store
-        2. Direct store reviews (if StoreReview model exists)
+        2. Direct store reviews
         """
-        from listings.models import Review
-        from django.db.models import Avg, Q
-        
-        all_ratings = []
-        
-        # Get product reviews for all listings in this store
-        product_reviews = Review.objects.filter(listing__store=self)
-        if product_reviews.exists():
-            product_avg = product_reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-            if product_avg:
-                all_ratings.append(product_avg)
-        
-        # Get direct store reviews if StoreReview model exists
-        try:
-            # Check if StoreReview model exists in current app
-            from .models import StoreReview
-            store_reviews = StoreReview.objects.filter(store=self)
-            if store_reviews.exists():
-                store_avg = store_reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-                if store_avg:
-                    all_ratings.append(store_avg)
-        except (ImportError, AttributeError):
-            # StoreReview model not defined yet, skip
-            pass
-        
-        # Calculate weighted average if we have both types of reviews
-        if not all_ratings:
-            return 0
-        
-        # Simple average of all ratings
-        combined_avg = sum(all_ratings) / len(all_ratings)
-        return round(combined_avg, 1)
+        return float(self.cached_rating)
 
     def get_review_count(self):
         """Get total number of reviews (product reviews + store reviews)."""
-        from listings.models import Review
-        total = 0
-        
-        # Count product reviews
-        total += Review.objects.filter(listing__store=self).count()
-        
-        # Count direct store reviews if StoreReview model exists
-        try:
-            from .models import StoreReview
-            total += StoreReview.objects.filter(store=self).count()
-        except (ImportError, AttributeError):
-            # StoreReview model not defined yet, skip
-            pass
-        
-        return total
+        return self.cached_review_count
     
 
+    @staticmethod
+    def user_reviewed_cache_key(store_id, user_id):
+        return f'store_reviewed:{store_id}:{user_id}'
+
     def has_user_reviewed(self, user):
-        """Check if user has reviewed this store (either via products or directly)."""
+        """Check if user has reviewed this store (either via products or directly).
+
+        Cached per (store, user); storefront.signals drops the entry when
+        one of the user's reviews is saved or deleted.
+        """
         if not user.is_authenticated:
             return False
-        
+
+        def reviewed():
+            from listings.models import Review
+
+            # One query covers product reviews and direct store reviews
+            return Review.objects.filter(listing__store=self, user=user).values('id').union(
+                StoreReview.objects.filter(store=self, reviewer=user).values('id'), all=True
+            ).exists()
+
+        return cache.get_or_set(self.user_reviewed_cache_key(self.pk, user.pk), reviewed, self.REVIEWED_CACHE_TIMEOUT)
+
+
+    def get_all_reviews(self, before=None):
+        """Get all reviews for this store (both product and direct store reviews).
+
+        Returns a UNION ALL queryset of row dicts ordered newest first, so
+        callers can count or slice it in the database. Rows carry ids only;
+        get_all_reviews_paginated() attaches reviewer and listing objects.
+        ``before`` is a (created_at, type, id) key; only rows after it in
+        that order are returned. The type is part of the key because a
+        product review and a store review can share an id.
+        """
         from listings.models import Review
-        
-        # Check if user has reviewed any product in this store
-        # FIXED: Changed 'reviewer' to 'user' to match the Review model field
-        has_product_review = Review.objects.filter(
-            listing__store=self,
-            user=user  # Changed from reviewer=user to user=user
-        ).exists()
-        
-        if has_product_review:
-            return True
-        
-        # Check if user has directly reviewed the store
-        try:
-            from .models import StoreReview
-            return StoreReview.objects.filter(store=self, reviewer=user).exists()
-        except (ImportError, AttributeError):
-            # StoreReview model not defined yet
-            return False
 
+        def seek(row_type):
+            if before is None:
+                return Q()
+            created_at, last_type, pk = before
+            q = Q(created_at__lt=created_at)
+            # Within one timestamp rows run by type, then newest id first
+            if row_type == last_type:
+                q |= Q(created_at=created_at, id__lt=pk)
+            elif row_type > last_type:
+                q |= Q(created_at=created_at)
+            return q
+
+        row_fields = ('id', 'rating', 'comment', 'created_at', 'type', 'reviewer_ref', 'listing_ref', 'helpful')
+        product_reviews = Review.objects.filter(seek('product'), listing__store=self).order_by().annotate(
+            type=models.Value('product', output_field=models.CharField()),
+            reviewer_ref=F('user_id'),
+            listing_ref=F('listing_id'),
+            helpful=models.Value(0, output_field=models.IntegerField()),  # Product reviews don't have helpful count
+        ).values(*row_fields)
+        store_reviews = StoreReview.objects.filter(seek('store'), store=self).order_by().annotate(
+            type=models.Value('store', output_field=models.CharField()),
+            reviewer_ref=F('reviewer_id'),
+            listing_ref=models.Value(None, output_field=models.BigIntegerField()),
+            helpful=F('helpful_count'),
+        ).values(*row_fields)
+
+        return product_reviews.union(store_reviews, all=True).order_by('-created_at', 'type', '-id')
+
+    @staticmethod
+    def _attach_review_objects(rows):
+        """Turn get_all_reviews() rows into review dicts with their reviewer and listing."""
+        from django.contrib.auth import get_user_model
+        from listings.models import Listing
 
-    def get_all_reviews(self):
-        """Get all reviews for this store (both product and direct store reviews)"""
+        users = get_user_model().objects.in_bulk({row['reviewer_ref'] for row in rows})
+        listings = Listing.objects.in_bulk({row['listing_ref'] for row in rows if row['listing_ref']})
+        return [
+            {
+                'type': row['type'],
+                'id': row['id'],
+                'reviewer': users.get(row['reviewer_ref']),
+                'rating': row['rating'],
+                'comment': row['comment'],
+                'created_at': row['created_at'],
+                'listing': listings.get(row['listing_ref']),
+                'helpful_count': row['helpful'],
+            }
+            for row in rows
+        ]
+
+    def get_all_reviews_paginated(self, cursor=None, per_page=10):
+        """Get one page of reviews using keyset pagination.
+
+        ``cursor`` is the value returned for the previous page (None for the
+        first one). Returns ``(reviews, next_cursor)``; next_cursor is None
+        on the last page. Each page is a range scan from the cursor, so deep
+        pages cost the same as the first.
+        """
+        before = None
+        if cursor and cursor.count('_') >= 2:
+            created_at, row_type, pk = cursor.rsplit('_', 2)
+            created_at = parse_datetime(created_at)
+            if created_at is not None and row_type in ('product', 'store') and pk.isdigit():
+                before = (created_at, row_type, int(pk))
+
+        # One extra row tells whether there is a next page
+        rows = list(self.get_all_reviews(before=before)[:per_page + 1])
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            last = rows[-1]
+            next_cursor = f"{last['created_at'].isoformat()}_{last['type']}_{last['id']}"
+        return self._attach_review_objects(rows), next_cursor
+
+    def get_rating_distribution(self):
+        """Map each star rating to its number of product and store reviews."""
         from listings.models import Review
-        
-        all_reviews = []
-        
-        # Get product reviews for this store's listings
-        product_reviews = Review.objects.filter(listing__store=self).select_related(
-            'user', 'listing'
-        ).order_by('-created_at')
-        
-        # Get direct store reviews
-        try:
-            store_reviews = self.reviews.all().select_related('reviewer').order_by('-created_at')
-        except (ImportError, AttributeError):
-            store_reviews = []
-        
-        # Combine and sort by date
-        for review in product_reviews:
-            all_reviews.append({
-                'type': 'product',
-                'id': review.id,
-                'reviewer': review.user,
-                'rating': review.rating,
-                'comment': review.comment,
-                'created_at': review.created_at,
-                'listing': review.listing,
-                'helpful_count': 0,  # Product reviews don't have helpful count
-            })
-        
-        for review in store_reviews:
-            all_reviews.append({
-                'type': 'store',
-                'id': review.id,
-                'reviewer': review.reviewer,
-                'rating': review.rating,
-                'comment': review.comment,
-                'created_at': review.created_at,
-                'listing': None,
-                'helpful_count': review.helpful_count,
-            })
-        
-        # Sort by created_at, newest first
-        all_reviews.sort(key=lambda x: x['created_at'], reverse=True)
-        
-        return all_reviews
 
-    def get_all_reviews_paginated(self, page=1, per_page=10):
-        """Get paginated reviews"""
-        all_reviews = self.get_all_reviews()
-        
-        # Simple pagination for list
-        from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-        
-        paginator = Paginator(all_reviews, per_page)
-        
-        try:
-            reviews_page = paginator.page(page)
-        except PageNotAnInteger:
-            reviews_page = paginator.page(1)
-        except EmptyPage:
-            reviews_page = paginator.page(paginator.num_pages)
-        
-        return reviews_page
+        distribution = defaultdict(int)
+        for reviews in (Review.objects.filter(listing__store=self), StoreReview.objects.filter(store=self)):
+            for row in reviews.order_by().values('rating').annotate(count=models.Count('id')):
+                distribution[row['rating']] += row['count']
+        return dict(sorted(distribution.items()))
     
     def get_average_store_rating(self):
         """Get average rating from direct store reviews only."""
-        try:
-            from .models import StoreReview
-            store_reviews = StoreReview.objects.filter(store=self)
-            if store_reviews.exists():
-                return store_reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
-        except (ImportError, AttributeError):
-            pass
-        return 0
+        return float(self.cached_store_rating)
     
     def get_product_reviews(self):
         """Get product reviews for this store's listings."""
         from listings.models import Review
-        return Review.objects.filter(listing__store=self).select_related('user', 'listing').order_by('-created_at')
+        return Review.objects.filter(listing__store=self).select_related('user', 'listing__store').order_by('-created_at')
     
     def increment_views(self, request=None):
         """Increment total views and track unique visitors"""
@@ -312,7 +352,21 @@ class Store(models.Model):
         Enforce that a user may only create more than one Store if they have a premium subscription
         (i.e., at least one existing Store with is_premium=True or an active Subscription).
         This prevents users from bypassing listing limits by creating additional free stores.
+        Newly uploaded logo/cover images are also checked here so every save
+        path validates them, while unchanged images are not re-checked.
         """
+        image_errors = {}
+        for field_name in ('logo', 'cover_image'):
+            upload = _pending_upload(getattr(self, field_name))
+            if upload is None:
+                continue
+            try:
+                validate_image_upload(upload, self.MAX_IMAGE_BYTES)
+            except ValidationError as e:
+                image_errors[field_name] = e.messages
+        if image_errors:
+            raise ValidationError(image_errors)
+
         # Only validate on create (no PK yet) or when owner is changing
         if not self.pk:
             # If the owner is not yet set (e.g., ModelForm validation before view assigns owner), skip here.
@@ -321,23 +375,20 @@ class Store(models.Model):
             if owner is None:
                 return
 
-            # Count existing stores for owner
-            existing = Store.objects.filter(owner=owner)
-            if existing.exists():
-                # If user already has stores, require that they have at least one premium store
-                has_premium_store = existing.filter(is_premium=True).exists()
-                # Also allow if there's an active subscription tied to any existing store
-                has_active_subscription = Subscription.objects.filter(
-                    store__owner=owner, 
-                    status='active'
-                ).exists()
-                has_valid_trial = Subscription.objects.filter(
-                    store__owner=owner,
-                    status='trialing',
-                    trial_ends_at__gt=timezone.now()
-                ).exists()
-                if not (has_premium_store or has_active_subscription or has_valid_trial):
-                    raise ValidationError("You must upgrade to Pro (subscribe) to create additional storefronts.")
+            # Existing stores, premium stores, and active subscriptions or valid
+            # trials on any of them, counted in one query (only > 0 matters)
+            existing = Store.objects.filter(owner=owner).aggregate(
+                stores=models.Count('id'),
+                premium_stores=models.Count('id', filter=Q(is_premium=True)),
+                subscriptions=models.Count('subscriptions', filter=(
+                    Q(subscriptions__status='active')
+                    | Q(subscriptions__status='trialing', subscriptions__trial_ends_at__gt=timezone.now())
+                )),
+            )
+            # If user already has stores, require a premium store, an active
+            # subscription or a valid trial
+            if existing['stores'] and not (existing['premium_stores'] or existing['subscriptions']):
+                raise ValidationError("You must upgrade to Pro (subscribe) to create additional storefronts.")
         
         # Additional validation for featured stores - REMOVED: is_featured is now set automatically
         # if self.is_featured:
@@ -358,17 +409,36 @@ class Store(models.Model):
         #             raise ValidationError("Store must have an active subscription or valid trial to be featured.")
     
     def save(self, *args, **kwargs):
-        # Run clean validation before saving
+        # Partial saves (update_fields) only sync flags such as is_premium,
+        # so full validation runs for creates and whole-row edits only
+        update_fields = kwargs.get('update_fields')
+
         # Prevent changing payout phone after verification
         try:
-            if self.pk:
+            if self.pk and (update_fields is None or 'payout_phone' in update_fields):
                 orig = Store.objects.filter(pk=self.pk).first()
                 if orig and orig.payout_verified and orig.payout_phone and self.payout_phone and orig.payout_phone != self.payout_phone:
                     raise ValidationError('Payout phone is locked after verification')
         except Exception:
             pass
 
-        self.full_clean()
+        # Fields left out by only()/defer() are neither validated nor written
+        deferred = {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.get_deferred_fields()
+        }
+        if update_fields is None:
+            # Run clean validation before saving
+            self.full_clean(exclude=deferred)
+        if not self._state.adding and update_fields is None:
+            # The cached stats are written with update(); don't put back the
+            # values this instance was loaded with
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.CACHED_STAT_FIELDS
+                and field.name not in deferred
+            ]
         super().save(*args, **kwargs)
     
 
@@ -382,8 +452,7 @@ class StoreVideo(models.Model):
     shares_count = models.PositiveIntegerField(default=0)
     views_count = models.PositiveIntegerField(default=0)
 
-    if 'cloudinary' in __import__('django.conf').conf.settings.INSTALLED_APPS and hasattr(__import__('django.conf').conf.settings, 'CLOUDINARY_CLOUD_NAME') and __import__('django.conf').conf.settings.CLOUDINARY_CLOUD_NAME:
-        from cloudinary.models import CloudinaryField
+    if USE_CLOUDINARY:
         video = CloudinaryField('video', folder='baysoko/stores/videos/', resource_type='video', null=True, blank=True)
     else:
         video = models.FileField(upload_to='store_videos/', null=True, blank=True)
@@ -440,18 +509,24 @@ class StoreReview(models.Model):
     class Meta:
         unique_together = ['store', 'reviewer']
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a store's reviews, newest first
+            models.Index(fields=['store', '-created_at', '-id'], name='storereview_store_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.reviewer.username} - {self.store.name} - {self.rating}★"
     
     def mark_helpful(self, user):
         """Mark review as helpful by a user"""
-        if not ReviewHelpful.objects.filter(review=self, user=user).exists():
-            ReviewHelpful.objects.create(review=self, user=user)
-            self.helpful_count += 1
-            self.save()
-            return True
-        return False
+        with transaction.atomic():
+            # The unique (review, user) vote decides who gets to count
+            _, created = ReviewHelpful.objects.get_or_create(review=self, user=user)
+            if not created:
+                return False
+            StoreReview.objects.filter(pk=self.pk).update(helpful_count=F('helpful_count') + 1)
+        self.refresh_from_db(fields=['helpful_count'])
+        return True
 
 
 class ReviewHelpful(models.Model):
@@ -480,6 +555,10 @@ class Subscription(models.Model):
         ('premium', 'Premium - KSh 1,999/month'),
         ('enterprise', 'Enterprise - KSh 4,999/month'),
     )
+
+    # Labels by value, built once instead of per get_*_display() call
+    _PLAN_DISPLAY = dict(PLAN_CHOICES)
+    _STATUS_DISPLAY = dict(SUBSCRIPTION_STATUS)
     
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='subscriptions')
     plan = models.CharField(max_length=20, choices=PLAN_CHOICES, default='free')
@@ -514,9 +593,21 @@ class Subscription(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['store', 'status', 'plan']),
+            # Partial indexes for the expiry sweeps, covering only the rows they scan
+            models.Index(fields=['trial_ends_at'], name='sub_trialing_ends_idx', condition=Q(status='trialing')),
+            models.Index(fields=['current_period_end'], name='sub_active_period_end_idx', condition=Q(status='active')),
+        ]
     
     def __str__(self):
         return f"{self.store.name} - {self.get_plan_display()} ({self.status})"
+
+    def get_plan_display(self):
+        return self._PLAN_DISPLAY.get(self.plan, self.plan)
+
+    def get_status_display(self):
+        return self._STATUS_DISPLAY.get(self.status, self.status)
     
     def is_active(self):
         """Check if subscription is currently active"""
@@ -579,7 +670,7 @@ class Subscription(models.Model):
         # Update store
         if self.store.is_featured != has_premium:
             self.store.is_featured = has_premium
-            self.store.save(update_fields=['is_featured'])
+            Store.objects.filter(pk=self.store_id).update(is_featured=has_premium)
         
         # Update all listings for this store
         Listing.objects.filter(store=self.store).update(is_featured=has_premium)
@@ -621,7 +712,7 @@ class Subscription(models.Model):
                 # Ensure featured cleared
                 if self.store.is_featured:
                     self.store.is_featured = False
-                    self.store.save(update_fields=['is_featured'])
+                    Store.objects.filter(pk=self.store_id).update(is_featured=False)
                 return True
         return False
 
@@ -654,7 +745,7 @@ class Subscription(models.Model):
         ).exists()
         if self.store.is_premium != has_active:
             self.store.is_premium = has_active
-            self.store.save(update_fields=['is_premium'])
+            Store.objects.filter(pk=self.store_id).update(is_premium=has_active)
 
         # Owner-level downgrade if no active subscriptions
         try:
@@ -846,6 +937,15 @@ class MpesaPayment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Pending payments polled by reconcile_mpesa_transactions
+            models.Index(fields=['created_at'], name='mpesa_pending_created_idx', condition=Q(status='pending')),
+            # A subscription's payments in a given status, newest first (the
+            # recent pending renewal check and the paid-trial checks). The
+            # renewal phone lookup orders by transaction_date, so it only
+            # uses the (subscription, status) prefix
+            models.Index(fields=['subscription', 'status', '-created_at'], name='mpesa_sub_status_recent_idx'),
+        ]
     
     def __str__(self):
         return f"MPesa Payment - {self.phone_number} - KSh {self.amount} - {self.status}"
@@ -934,7 +1034,7 @@ class WithdrawalRequest(models.Model):
 
             if not self.store.payout_phone or not self.store.payout_verified:
                 self.status = 'failed'
-                self.save()
+                self.save(update_fields=['status'])
                 return False
 
             success, provider_ref = payout_to_phone(self.store.payout_phone, self.amount, reference=self.reference)
@@ -946,16 +1046,16 @@ class WithdrawalRequest(models.Model):
                 else:
                     # Record provider ref if available
                     self.reference = provider_ref or self.reference
-                self.save()
+                self.save(update_fields=['status', 'processed_at', 'reference'])
                 return True
             else:
                 self.status = 'failed'
                 self.note = str(provider_ref)
-                self.save()
+                self.save(update_fields=['status', 'note'])
                 return False
         except Exception:
             self.status = 'failed'
-            self.save()
+            self.save(update_fields=['status'])
             return False
 
 
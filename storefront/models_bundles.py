@@ -5,6 +5,7 @@ from django.utils.text import slugify
 import uuid
 from django.utils import timezone
 from django.conf import settings
+from django.core.cache import cache
 from listings.models import ListingImage
 
 class ProductBundle(models.Model):
@@ -61,6 +62,10 @@ class ProductBundle(models.Model):
     
     def __str__(self):
         return self.name
+
+    @staticmethod
+    def sku_seq_cache_key(store_id):
+        return f'store:{store_id}:bundle_sku_seq'
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -85,6 +90,8 @@ class ProductBundle(models.Model):
             )
         
         super().save(*args, **kwargs)
+        # The next suggested SKU is re-read from the store's bundles
+        cache.delete(self.sku_seq_cache_key(self.store_id))
     
     def calculate_base_price(self):
         """Calculate total price of bundle items"""
@@ -0,0 +1,38 @@
+"""Receivers keeping Store's cached review and sales columns current.
+
+Kept apart from signals.py so they are registered on their own and do not
+depend on the owner notification receivers there.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from listings.models import Listing, OrderItem, Review
+from .models import Store, StoreReview
+from .utils.store_stats import refresh_store_stats
+
+
+@receiver(post_save, sender=StoreReview)
+@receiver(post_delete, sender=StoreReview)
+def store_review_stats_changed(sender, instance, **kwargs):
+    refresh_store_stats(Store.objects.filter(pk=instance.store_id))
+    cache.delete(Store.user_reviewed_cache_key(instance.store_id, instance.reviewer_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def product_review_changed(sender, instance, **kwargs):
+    if instance.listing_id:
+        store_id = Listing.objects.filter(pk=instance.listing_id).values_list('store_id', flat=True).first()
+        if store_id:
+            cache.delete(Store.user_reviewed_cache_key(store_id, instance.user_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def listing_stats_changed(sender, instance, **kwargs):
+    # Product reviews and sales count towards the listing's store
+    if instance.listing_id:
+        refresh_store_stats(Store.objects.filter(listings=instance.listing_id))
@@ -299,40 +299,42 @@ class SubscriptionService:
     @classmethod
     def enforce_trial_expiry(cls):
         """Strict enforcement of trial expiry - disables premium features immediately"""
+        now = timezone.now()
         expired_trials = Subscription.objects.filter(
             status='trialing',
-            trial_ends_at__lt=timezone.now(),
+            trial_ends_at__lt=now,
             store__is_premium=True
-        ).select_related('store')
+        ).select_related('store__owner')
         
         for subscription in expired_trials:
             with transaction.atomic():
                 # Mark trial as expired and sync store via centralized setter
                 subscription.metadata = subscription.metadata or {}
                 subscription.metadata.update({
-                    'trial_expired_at': timezone.now().isoformat(),
+                    'trial_expired_at': now.isoformat(),
                     'auto_downgraded': True,
                 })
-                subscription.save()
+                subscription.save(update_fields=['metadata', 'updated_at'])
                 subscription.set_status('canceled')
                 logger.info(f"Trial expired and premium features disabled for store: {subscription.store.name}")
     
     @classmethod
     def enforce_subscription_expiry(cls):
         """Strict enforcement of subscription expiry"""
+        now = timezone.now()
         expired_subs = Subscription.objects.filter(
             status='active',
-            current_period_end__lt=timezone.now()
-        ).select_related('store')
+            current_period_end__lt=now
+        ).select_related('store__owner')
         
         for subscription in expired_subs:
             with transaction.atomic():
                 subscription.metadata = subscription.metadata or {}
                 subscription.metadata.update({
-                    'subscription_expired_at': timezone.now().isoformat(),
+                    'subscription_expired_at': now.isoformat(),
                     'payment_required': True,
                 })
-                subscription.save()
+                subscription.save(update_fields=['metadata', 'updated_at'])
                 subscription.set_status('past_due')
                 logger.info(f"Subscription expired for store: {subscription.store.name}")
     
@@ -647,7 +649,7 @@ class SubscriptionService:
                 'trial_end_reason': reason,
                 'auto_downgraded': True,
             })
-            subscription.save()
+            subscription.save(update_fields=['metadata', 'updated_at'])
             subscription.set_status('canceled')
             
             # Record trial end
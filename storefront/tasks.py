@@ -12,7 +12,7 @@ def process_scheduled_withdrawals():
     """
     now = timezone.now()
     # Process only those scheduled for now or earlier
-    scheduled = WithdrawalRequest.objects.filter(status='scheduled', scheduled_for__lte=now)
+    scheduled = WithdrawalRequest.objects.filter(status='scheduled', scheduled_for__lte=now).select_related('store')
     results = []
     for w in scheduled:
         ok = w.process()
@@ -228,6 +228,73 @@ def check_active_subscription_expirations():
     return {'expired_marked': count}
 
 
+@shared_task
+def initiate_subscription_renewal(subscription_id, phone, store_id):
+    """Send the renewal STK push for one due subscription.
+
+    Dispatched in a group by the process_subscriptions command so the
+    gateway round-trips run concurrently across workers. The subscription
+    is marked past_due if the push cannot be initiated.
+    """
+    from .models import Subscription, MpesaPayment
+    from .mpesa import MpesaGateway
+
+    mpesa = MpesaGateway()
+    try:
+        phone_norm = mpesa._normalize_phone(phone)
+        response = mpesa.initiate_stk_push(
+            phone=phone_norm,
+            amount=999,
+            account_reference=f"Store-{store_id}-Renewal"
+        )
+        MpesaPayment.objects.create(
+            subscription_id=subscription_id,
+            checkout_request_id=response['CheckoutRequestID'],
+            merchant_request_id=response['MerchantRequestID'],
+            phone_number=phone_norm,
+            amount=999,
+            status='pending'
+        )
+    except Exception as e:
+        logger.warning('Failed to initiate renewal for subscription %s: %s', subscription_id, e)
+        Subscription.objects.filter(id=subscription_id).update(status='past_due', updated_at=timezone.now())
+        return False
+    return True
+
+
+@shared_task
+def process_subscriptions():
+    """Run the process_subscriptions sweeps from Celery beat.
+
+    The command is called in-process so the worker's loaded app registry and
+    open DB connection are reused instead of starting manage.py from cron.
+    """
+    from django.core.management import call_command
+
+    # Renewals send STK pushes and run on their own, slower schedule
+    call_command('process_subscriptions', skip_renewals=True)
+
+
+@shared_task
+def process_subscription_renewals():
+    """Run the renewal sweep of process_subscriptions from Celery beat."""
+    from django.core.management import call_command
+
+    call_command('process_subscriptions', renewals_only=True)
+
+
+@shared_task
+def reconcile_mpesa_transactions(minutes=2):
+    """Poll M-Pesa for payments still pending after `minutes`.
+
+    Routed to the `mpesa` queue so slow Daraja status queries do not hold up
+    the periodic queue.
+    """
+    from django.core.management import call_command
+
+    call_command('reconcile_mpesa_transactions', minutes=minutes)
+
+
 @shared_task
 def send_weekly_reactivation_reminders():
     """Send weekly reminders to users with canceled subscriptions to reactivate.
@@ -4,12 +4,20 @@ from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from unittest.mock import patch
 from types import SimpleNamespace
+from io import BytesIO
+from PIL import Image
 
 from ..models import Store, Subscription
 from ..models_bulk import BatchJob
 from ..forms_bulk import BulkImportForm
 from ..tasks_bulk import _parse_image_candidates, process_import_task, process_product_import_row
-from ..image_fetcher import generate_title_image_bytes, save_image_to_listing
+from ..image_fetcher import (
+    download_image,
+    generate_title_image_bytes,
+    prepare_image_bytes,
+    save_image_to_listing,
+    search_wikimedia_images,
+)
 from listings.models import Listing, ListingImage
 
 User = get_user_model()
@@ -285,3 +293,39 @@ class BulkImportTests(TestCase):
 
         self.assertIsNotNone(listing_image)
         self.assertTrue(str(listing_image.image))
+
+    def test_prepare_image_bytes_downscales_to_jpeg(self):
+        buf = BytesIO()
+        Image.new('RGBA', (2400, 1200), (255, 0, 0, 0)).save(buf, format='PNG')
+        prepared = prepare_image_bytes(buf.getvalue(), max_size=(800, 800))
+
+        with Image.open(BytesIO(prepared)) as im:
+            self.assertEqual(im.format, 'JPEG')
+            self.assertEqual(im.size, (800, 400))
+            self.assertEqual(im.getpixel((0, 0)), (255, 255, 255))
+        self.assertIsNone(prepare_image_bytes(b'not an image'))
+
+    @patch('storefront.image_fetcher._session')
+    def test_search_wikimedia_images_returns_imageinfo_in_rank_order(self, mock_session):
+        mock_session.get.return_value.json.return_value = {'query': {'pages': {
+            '20': {'pageid': 20, 'index': 2, 'title': 'File:B.jpg', 'imageinfo': [{'url': 'https://x/b.jpg'}]},
+            '10': {'pageid': 10, 'index': 1, 'title': 'File:A.jpg', 'imageinfo': [{'url': 'https://x/a.jpg'}]},
+        }}}
+
+        pages = search_wikimedia_images('camera')
+
+        self.assertEqual([page['title'] for page in pages], ['File:A.jpg', 'File:B.jpg'])
+        self.assertEqual(mock_session.get.call_count, 1)
+        self.assertEqual(mock_session.get.call_args.kwargs['params']['generator'], 'search')
+
+    @patch('storefront.image_fetcher._session')
+    def test_download_image_assembles_chunks_within_limit(self, mock_session):
+        response = mock_session.get.return_value.__enter__.return_value
+        response.headers = {'Content-Type': 'image/png', 'Content-Length': '4'}
+        response.iter_content.return_value = [b'abc', b'def']
+
+        self.assertEqual(download_image('https://x/a.png'), b'abcdef')
+        self.assertIsNone(download_image('https://x/a.png', max_bytes=5))
+
+        response.headers = {'Content-Type': 'image/png', 'Content-Length': '10'}
+        self.assertIsNone(download_image('https://x/a.png', max_bytes=5))
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from ..context_processors import store_context
+from ..models import Store, Subscription
+from ..utils.subscription import latest_subscriptions_by_store
+
+
+User = get_user_model()
+
+
+class StoreContextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ctxowner', email='ctx@test.com', password='pass')
+        self.store = Store.objects.create(owner=self.user, name='Ctx Store', slug='ctx-store')
+        Subscription.objects.filter(store=self.store).delete()
+
+        now = timezone.now()
+        old = Subscription.objects.create(store=self.store, plan='basic', status='canceled', amount=999)
+        self.latest = Subscription.objects.create(
+            store=self.store, plan='premium', status='trialing', amount=1999,
+            trial_ends_at=now + timedelta(days=7),
+        )
+        Subscription.objects.filter(pk=old.pk).update(created_at=now - timedelta(days=30))
+        Subscription.objects.filter(pk=self.latest.pk).update(created_at=now)
+
+        # A second store needs the active subscription above to exist first
+        self.other_store = Store.objects.create(owner=self.user, name='Other Store', slug='other-store')
+        Subscription.objects.filter(store=self.other_store).delete()
+
+    def test_latest_subscriptions_by_store_picks_newest(self):
+        latest = latest_subscriptions_by_store(self.user)
+        self.assertEqual(latest[self.store.id].pk, self.latest.pk)
+        self.assertNotIn(self.other_store.id, latest)
+
+    def test_store_context_keeps_plan_info_off_store_instances(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        context = store_context(request)
+
+        info = {entry['store'].slug: entry for entry in context['user_stores_info']}
+        self.assertEqual(info['ctx-store']['plan'], 'premium')
+        self.assertTrue(info['ctx-store']['is_trial'])
+        self.assertEqual(info['other-store']['plan'], 'free')
+        self.assertEqual(info['other-store']['badge_class'], 'plan-badge-free')
+        self.assertEqual(context['total_user_stores'], 2)
+        for store in context['user_stores']:
+            self.assertFalse(hasattr(store, 'plan_badge_class'))
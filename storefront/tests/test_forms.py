@@ -0,0 +1,125 @@
+import io
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+
+from ..forms import StoreForm, UpgradeForm
+from ..models import Store, Subscription
+
+
+User = get_user_model()
+
+
+def _png_upload(name='logo.png', content_type='image/png'):
+    buf = io.BytesIO()
+    Image.new('RGB', (4, 4), 'white').save(buf, format='PNG')
+    return SimpleUploadedFile(name, buf.getvalue(), content_type=content_type)
+
+
+class UpgradeFormPhoneTests(TestCase):
+    def test_accepts_kenyan_formats(self):
+        for raw in ('0712345678', '712345678', '254712345678', '0712 345 678', '+254712345678'):
+            form = UpgradeForm({'phone_number': raw})
+            self.assertTrue(form.is_valid(), raw)
+            self.assertEqual(form.cleaned_data['phone_number'], '+254712345678')
+
+    def test_accepts_safaricom_01_prefix(self):
+        for raw in ('0112345678', '254112345678'):
+            form = UpgradeForm({'phone_number': raw})
+            self.assertTrue(form.is_valid(), raw)
+            self.assertEqual(form.cleaned_data['phone_number'], '+254112345678')
+
+    def test_rejects_unknown_formats(self):
+        for raw in ('0712', '123456789012', '812345678', '0212345678', '+254212345678'):
+            form = UpgradeForm({'phone_number': raw})
+            self.assertFalse(form.is_valid(), raw)
+            self.assertIn('phone_number', form.errors)
+
+
+class StoreFormImageTests(TestCase):
+    data = {'name': 'Image Store', 'slug': 'image-store', 'location': 'Nairobi'}
+
+    def test_accepts_small_image(self):
+        form = StoreForm(self.data, MultiValueDict({'logo': [_png_upload()]}))
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_rejects_oversized_image(self):
+        form = StoreForm(self.data, MultiValueDict({'cover_image': [_png_upload('cover.png')]}))
+        form.instance.MAX_IMAGE_BYTES = 10
+        self.assertFalse(form.is_valid())
+        self.assertIn('cover_image', form.errors)
+
+    def test_unknown_extension_must_have_image_signature(self):
+        form = StoreForm(self.data, MultiValueDict({'logo': [_png_upload('logo.bmp')]}))
+        self.assertTrue(form.is_valid(), form.errors)
+
+        fake = SimpleUploadedFile('logo.bin', b'not an image', content_type='image/png')
+        form = StoreForm(self.data, MultiValueDict({'logo': [fake]}))
+        self.assertFalse(form.is_valid())
+        self.assertIn('logo', form.errors)
+
+
+class StoreFormSlugTests(TestCase):
+    def test_taken_slug_is_reported_on_the_field(self):
+        owner = User.objects.create_user(username='slugowner', email='so@test.com', password='pass')
+        Store.objects.create(owner=owner, name='Taken', slug='taken-slug')
+        form = StoreForm({'name': 'Mine', 'slug': 'taken-slug', 'location': 'Nairobi'}, MultiValueDict())
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['slug'], ["This store URL is already taken. Please choose a different one."])
+
+    def test_slug_lost_to_a_concurrent_save_is_reported_on_the_field(self):
+        owner = User.objects.create_user(username='raced', email='r@test.com', password='pass')
+        Store.objects.create(owner=owner, name='First', slug='raced-slug')
+        store = Store(owner=owner, name='Second', slug='raced-slug')
+        # Validation passed before the other request committed the slug
+        with patch.object(Store, 'full_clean'):
+            with self.assertRaises(ValidationError) as ctx:
+                StoreForm.save_store(store)
+        self.assertEqual(ctx.exception.message_dict['slug'], ["This store URL is already taken. Please choose a different one."])
+
+
+class StoreFormFeaturedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='featured', email='f@test.com', password='pass')
+        self.store = Store.objects.create(owner=self.user, name='Featured Store', slug='featured-store')
+        Subscription.objects.filter(store=self.store).delete()
+
+    def test_no_subscription_cannot_be_featured(self):
+        form = StoreForm(instance=self.store, user=self.user)
+        self.assertFalse(form.can_be_featured)
+        self.assertNotIn('is_featured', form.fields)
+
+    def test_valid_trial_can_be_featured(self):
+        Subscription.objects.create(
+            store=self.store, plan='premium', status='trialing', amount=1999,
+            trial_ends_at=timezone.now() + timedelta(days=3),
+        )
+        form = StoreForm(instance=self.store, user=self.user)
+        self.assertTrue(form.can_be_featured)
+        self.assertFalse(form.is_enterprise)
+        self.assertIn('is_featured', form.fields)
+
+    def test_active_enterprise_uses_single_query(self):
+        Subscription.objects.create(store=self.store, plan='enterprise', status='active', amount=4999)
+        with self.assertNumQueries(1):
+            form = StoreForm(instance=self.store, user=self.user)
+            self.assertTrue(form._get_featured_status(self.store))
+        self.assertTrue(form.can_be_featured)
+        self.assertTrue(form.is_enterprise)
+        self.assertTrue(form.fields['is_featured'].disabled)
+
+    def test_forms_in_one_request_share_the_subscription_query(self):
+        Subscription.objects.create(store=self.store, plan='premium', status='active', amount=1999)
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(1):
+            StoreForm(instance=self.store, user=self.user, request=request)
+            form = StoreForm({}, instance=self.store, user=self.user, request=request)
+        self.assertTrue(form.can_be_featured)
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ..forms_bulk import BulkProductUpdateForm
+from ..models import Store
+from listings.models import Category, Listing
+
+
+User = get_user_model()
+
+
+class BulkProductUpdateFormTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulkform', email='bf@test.com', password='pass')
+        self.store = Store.objects.create(owner=self.user, name='Bulk Form Store', slug='bulk-form-store')
+        self.category = Category.objects.create(name='Bulk Category')
+        self.listings = [
+            Listing.objects.create(
+                title=f'Item {i}', price=Decimal('10.00'), description='Item',
+                seller=self.user, store=self.store, category=self.category, is_active=True,
+            )
+            for i in range(3)
+        ]
+
+    def test_unbound_form_does_not_query_products(self):
+        with self.assertNumQueries(0):
+            form = BulkProductUpdateForm(self.store)
+        self.assertEqual(
+            sorted(form.fields['products'].initial),
+            sorted(listing.pk for listing in self.listings),
+        )
+
+    def test_selected_products_are_validated(self):
+        form = BulkProductUpdateForm(self.store, {
+            'action': 'update_status',
+            'new_status': 'inactive',
+            'products': [str(self.listings[0].pk)],
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['products'], [str(self.listings[0].pk)])
+
+        form = BulkProductUpdateForm(self.store, {
+            'action': 'update_status',
+            'new_status': 'inactive',
+            'products': ['999999'],
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('products', form.errors)
+
+    def test_no_products_selected_cleans_to_empty_list(self):
+        form = BulkProductUpdateForm(self.store, {'action': 'update_status', 'new_status': 'active'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['products'], [])
+
+    def test_action_requires_its_fields(self):
+        form = BulkProductUpdateForm(self.store, {'action': 'update_price', 'price_value': '0'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'price_value', 'price_update_method'})
+
+        form = BulkProductUpdateForm(self.store, {
+            'action': 'update_stock', 'stock_value': '0', 'stock_update_method': 'set',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_price_range_must_be_ordered(self):
+        data = {'action': 'update_status', 'new_status': 'active', 'filter_price_min': '5'}
+        form = BulkProductUpdateForm(self.store, dict(data, filter_price_max='0'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('filter_price_max', form.errors)
+        self.assertIn('min="0"', str(form['filter_price_max']))
+
+        form = BulkProductUpdateForm(self.store, dict(data, filter_price_max='5'))
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_category_choices_are_the_store_categories(self):
+        Category.objects.create(name='Unused Category')
+        form = BulkProductUpdateForm(self.store)
+        self.assertEqual(list(form.fields['new_category'].queryset), [self.category])
+        self.assertEqual(list(form.fields['filter_category'].queryset), [self.category])
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..forms_bundles import ProductBundleForm
+from ..models import Store
+
+
+User = get_user_model()
+
+
+class ProductBundleFormTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='bundles', email='b@test.com', password='pass')
+        self.store = Store.objects.create(owner=user, name='Bundle Store', slug='bundle-store')
+
+    def test_suggested_sku_follows_the_highest_in_use(self):
+        # Bundles 1-3 were created and #1 deleted, so -000003 is the highest left
+        highest = f'BUNDLE-{self.store.id}-000003'
+        with patch('storefront.forms_bundles.safe_db_query', return_value=highest) as lookup:
+            first = ProductBundleForm(self.store).initial['sku']
+            second = ProductBundleForm(self.store).initial['sku']
+        self.assertEqual(first, f'BUNDLE-{self.store.id}-000004')
+        self.assertEqual(second, first)
+        # The highest suffix is cached until a bundle is saved
+        lookup.assert_called_once()
+
+    def test_rendering_does_not_consume_a_sku(self):
+        ProductBundleForm(self.store, {'name': 'Combo'})
+        ProductBundleForm(self.store)
+        self.assertEqual(ProductBundleForm(self.store).initial['sku'], f'BUNDLE-{self.store.id}-000001')
@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ..forms_inventory import ProductVariantForm
+from ..models import ProductVariant, Store
+from listings.models import Listing
+
+
+User = get_user_model()
+
+
+class ProductVariantFormTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='variants', email='v@test.com', password='pass')
+        store = Store.objects.create(owner=user, name='Variant Store', slug='variant-store')
+        self.listing = Listing.objects.create(
+            title='Shirt', price=Decimal('10.00'), description='Shirt',
+            seller=user, store=store, is_active=True,
+        )
+        ProductVariant.objects.create(listing=self.listing, name='Size', value='M', sku='SHIRT-M')
+
+    def test_duplicate_sku_is_rejected_by_a_single_unique_check(self):
+        form = ProductVariantForm({'name': 'Size', 'value': 'L', 'sku': 'SHIRT-M', 'price_adjustment': '0', 'stock': '1'})
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['sku'], ['SKU already exists'])
+
+    def test_editing_a_variant_keeps_its_own_sku(self):
+        variant = ProductVariant.objects.get(sku='SHIRT-M')
+        form = ProductVariantForm(
+            {'name': 'Size', 'value': 'M', 'sku': 'SHIRT-M', 'price_adjustment': '0', 'stock': '3'},
+            instance=variant,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
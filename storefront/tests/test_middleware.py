@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from listings.models import Listing
+
+from ..middleware import StoreViewMiddleware, SubscriptionMiddleware
+from ..models import Store, Subscription
+
+
+User = get_user_model()
+
+
+class SubscriptionMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='gated', email='g@test.com', password='pass')
+        self.store = Store.objects.create(owner=self.user, name='Gated Store', slug='gated-store')
+        Subscription.objects.filter(store=self.store).delete()
+        self.middleware = SubscriptionMiddleware(lambda request: None)
+
+    def _process(self, path):
+        request = RequestFactory().get(path)
+        request.user = self.user
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        request._now = timezone.now()
+        return request, self.middleware.process_view(request, None, (), {'slug': self.store.slug})
+
+    def test_ungated_store_page_skips_subscription_lookup(self):
+        # Only the expired-trial check runs
+        with self.assertNumQueries(1):
+            request, response = self._process(f'/dashboard/store/{self.store.slug}/edit/')
+        self.assertIsNone(response)
+        self.assertFalse(hasattr(request, 'store_subscription'))
+
+        # The check is not repeated for the same user within the interval
+        with self.assertNumQueries(0):
+            self._process(f'/dashboard/store/{self.store.slug}/edit/')
+
+    def test_premium_page_without_subscription_redirects_to_plans(self):
+        request, response = self._process(f'/dashboard/store/{self.store.slug}/bulk/')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(request.store_subscription['has_active'])
+
+        Subscription.objects.create(store=self.store, plan='premium', status='active', amount=1999)
+        request, response = self._process(f'/dashboard/store/{self.store.slug}/bulk/')
+        self.assertIsNone(response)
+        self.assertEqual(request.store_subscription['plan'], 'premium')
+
+    @patch('storefront.tasks.send_trial_expired_notification.delay')
+    def test_expired_trial_is_ended_once_and_notified_after_commit(self, mock_notify):
+        subscription = Subscription.objects.create(
+            store=self.store, plan='premium', status='trialing', amount=1999,
+            trial_ends_at=timezone.now() - timedelta(hours=1),
+        )
+        listing = Listing.objects.create(
+            title='Featured', price=Decimal('10.00'), description='Featured',
+            seller=self.user, store=self.store, is_active=True, is_featured=True,
+        )
+        # Leave the downgrade to the middleware's own branch
+        cache.add(f'trial_enforced:{self.user.pk}', 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            request, response = self._process(f'/dashboard/store/{self.store.slug}/bulk/')
+        self.assertEqual(response.status_code, 302)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, 'canceled')
+        self.assertIsNotNone(subscription.trial_ended_at)
+        mock_notify.assert_called_once_with(subscription.pk)
+        listing.refresh_from_db()
+        self.assertFalse(listing.is_featured)
+
+
+class StoreViewMiddlewareTests(TestCase):
+    def test_store_detail_view_is_counted_with_one_update(self):
+        user = User.objects.create_user(username='viewed', email='v@test.com', password='pass')
+        store = Store.objects.create(owner=user, name='Viewed Store', slug='viewed-store')
+
+        def store_detail(request, slug):
+            return None
+
+        middleware = StoreViewMiddleware(lambda request: None)
+        with self.assertNumQueries(1):
+            middleware.process_view(RequestFactory().get('/'), store_detail, (), {'slug': store.slug})
+        store.refresh_from_db()
+        self.assertEqual(store.total_views, 1)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from ..management.commands.monitor_trials import Command
+from ..models import Store, Subscription
+from ..models_trial import UserTrial
+
+
+User = get_user_model()
+
+
+class MonitorTrialsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trialmon', email='tm@test.com', password='pass')
+        self.store = Store.objects.create(owner=self.user, name='Trial Store', slug='trial-store')
+        Subscription.objects.filter(store=self.store).delete()
+        self.subscription = Subscription.objects.create(
+            store=self.store, plan='premium', status='trialing', amount=1999,
+            trial_ends_at=timezone.now() + timedelta(days=7),
+        )
+
+    def _trial(self, number, status='active'):
+        return UserTrial.objects.create(
+            user=self.user, store=self.store, subscription=self.subscription,
+            trial_number=number, started_at=timezone.now() - timedelta(days=number), status=status,
+        )
+
+    def test_update_trial_stats_logs_totals(self):
+        self._trial(1, status='converted')
+        self._trial(2)
+        with self.assertLogs('storefront.management.commands.monitor_trials', 'INFO') as logs:
+            with self.assertNumQueries(2):
+                Command().update_trial_stats()
+        self.assertIn('2 total trials, 1 converted (50.0%), 1 users with multiple trials', logs.output[0])
+
+    def test_flag_potential_abuse_checks_paid_subscriptions_in_one_query(self):
+        self._trial(1)
+        with self.assertLogs('storefront.management.commands.monitor_trials', 'WARNING') as logs:
+            with self.assertNumQueries(1):
+                Command().flag_potential_abuse()
+        self.assertIn('Suspicious user detected: tm@test.com', logs.output[0])
+
+        Subscription.objects.create(store=self.store, plan='basic', status='active', amount=999)
+        with self.assertNoLogs('storefront.management.commands.monitor_trials', 'WARNING'):
+            Command().flag_potential_abuse()
@@ -1,9 +1,15 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models.signals import post_save
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from unittest.mock import patch, MagicMock
+from ..management.commands.reconcile_mpesa_transactions import Command as ReconcileCommand
 from ..models import Store, Subscription, MpesaPayment
+from delivery.models import DeliveryRequest
 from datetime import datetime, timedelta
 import json
 
@@ -115,7 +121,7 @@ class MpesaPaymentTests(TestCase):
         # Verify subscription activated
         self.subscription.refresh_from_db()
         self.assertEqual(self.subscription.status, 'active')
-        self.assertIsNotNone(self.subscription.next_billing_date)
+        self.assertIsNotNone(self.subscription.current_period_end)
 
     def test_subscription_trial_expiration(self):
         """Test trial expiration handling"""
@@ -140,13 +146,13 @@ class MpesaPaymentTests(TestCase):
         # Verify subscription converted to active
         self.subscription.refresh_from_db()
         self.assertEqual(self.subscription.status, 'active')
-        self.assertIsNotNone(self.subscription.next_billing_date)
+        self.assertIsNotNone(self.subscription.current_period_end)
 
     def test_subscription_renewal(self):
         """Test subscription renewal process"""
         # Set up active subscription due for renewal
         self.subscription.status = 'active'
-        self.subscription.next_billing_date = timezone.now() - timedelta(days=1)
+        self.subscription.current_period_end = timezone.now() - timedelta(days=1)
         self.subscription.save()
 
         # Create previous successful payment
@@ -172,7 +178,9 @@ class MpesaPaymentTests(TestCase):
 
                 # Run management command
                 from django.core.management import call_command
-                call_command('process_subscriptions')
+                # Renewal tasks are dispatched once the sweep commits
+                with self.captureOnCommitCallbacks(execute=True):
+                    call_command('process_subscriptions')
 
         # Verify new payment created
         new_payment = MpesaPayment.objects.filter(
@@ -180,4 +188,92 @@ class MpesaPaymentTests(TestCase):
             status='pending'
         ).first()
         self.assertIsNotNone(new_payment)
-        self.assertEqual(new_payment.amount, 999)
\ No newline at end of file
+        self.assertEqual(new_payment.amount, 999)
+
+class ReconcileMpesaTransactionsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='reconcile', password='pass')
+        store = Store.objects.create(owner=user, name='Reconcile Store', slug='reconcile-store')
+        subscription = Subscription.objects.create(store=store, plan='basic', status='unpaid')
+        self.payments = [
+            MpesaPayment.objects.create(
+                subscription=subscription, checkout_request_id=f'ws_CO_{i}', merchant_request_id=f'MR{i}',
+                phone_number='254712345678', amount=999, status='pending',
+            )
+            for i in range(2)
+        ]
+        MpesaPayment.objects.update(created_at=timezone.now() - timedelta(minutes=10))
+
+    @patch('listings.mpesa_utils.mpesa_gateway.check_transaction_status')
+    def test_payment_settled_during_the_poll_is_not_overwritten(self, mock_status):
+        settled = self.payments[0]
+        mock_status.side_effect = lambda checkout_request_id: (
+            {'success': True, 'result_code': '1032', 'result_desc': 'Cancelled by user'}
+            if checkout_request_id == settled.checkout_request_id
+            else {'success': True, 'result_code': '0', 'result_desc': 'Success'}
+        )
+        query_statuses = ReconcileCommand._query_statuses
+
+        def query_then_settle(command, *args):
+            statuses = query_statuses(command, *args)
+            # The callback lands while the statuses are being polled
+            MpesaPayment.objects.filter(pk=settled.pk).update(status='completed', result_code='0')
+            return statuses
+
+        out = StringIO()
+        with patch.object(ReconcileCommand, '_query_statuses', query_then_settle):
+            call_command('reconcile_mpesa_transactions', stdout=out)
+
+        self.assertEqual(mock_status.call_count, 2)
+        settled.refresh_from_db()
+        self.assertEqual(settled.status, 'completed')
+        self.assertEqual(MpesaPayment.objects.get(pk=self.payments[1].pk).status, 'completed')
+        self.assertIn('Subscription payments: checked=2 completed=1 failed=0 already_finalized=1', out.getvalue())
+
+    @patch('listings.mpesa_utils.mpesa_gateway.check_transaction_status')
+    def test_finalized_subscription_payments_run_post_save_receivers(self, mock_status):
+        mock_status.return_value = {'success': True, 'result_code': '0', 'result_desc': 'Success'}
+        receiver = MagicMock()
+        post_save.connect(receiver, sender=MpesaPayment)
+        self.addCleanup(post_save.disconnect, receiver, sender=MpesaPayment)
+
+        call_command('reconcile_mpesa_transactions', stdout=StringIO())
+
+        self.assertEqual(receiver.call_count, 2)
+        for call in receiver.call_args_list:
+            self.assertFalse(call.kwargs['created'])
+            self.assertEqual(call.kwargs['instance'].status, 'completed')
+
+    @patch('listings.mpesa_utils.mpesa_gateway.check_transaction_status')
+    def test_completed_order_payment_is_written_once(self, mock_status):
+        from listings.models import Order, Payment as OrderPayment
+
+        MpesaPayment.objects.update(status='completed')
+        order = Order.objects.create(user=User.objects.get(username='reconcile'), total_price=500)
+        payment = OrderPayment.objects.create(
+            order=order, amount=500, status='initiated', mpesa_checkout_request_id='ws_CO_order',
+        )
+        OrderPayment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(minutes=10))
+        mock_status.return_value = {
+            'success': True, 'result_code': '0', 'result_desc': 'Success',
+            'response_data': {'Body': {'stkCallback': {'CallbackMetadata': {'Item': [
+                {'Name': 'MpesaReceiptNumber', 'Value': 'RCPT123'},
+            ]}}}},
+        }
+
+        out = StringIO()
+        with patch.object(OrderPayment, 'save') as payment_save, \
+                patch('listings.signals.webhook_service.send_order_event') as send_order_event:
+            call_command('reconcile_mpesa_transactions', stdout=out)
+
+        payment_save.assert_not_called()
+        # The payment's post_save receivers still run
+        send_order_event.assert_any_call(order, 'order_paid')
+        self.assertTrue(DeliveryRequest.objects.filter(order_id=str(order.id)).exists())
+        payment.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+        self.assertEqual(payment.transaction_id, 'RCPT123')
+        self.assertIsNotNone(payment.completed_at)
+        self.assertEqual(order.status, 'paid')
+        self.assertIn('Order payments: checked=1 completed=1', out.getvalue())
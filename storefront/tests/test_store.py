@@ -1,10 +1,16 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.utils import timezone
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
 
-from ..models import Store, Subscription
-from listings.models import Listing, Category
+from ..models import Store, StoreReview, Subscription
+from listings.models import Listing, Category, Order, OrderItem, Review
 from django.urls import reverse
 
 
@@ -23,6 +29,18 @@ class StoreCreationTests(TestCase):
         with self.assertRaises(ValidationError):
             second.save()
 
+    def test_second_store_allowed_with_a_valid_trial(self):
+        first = Store.objects.create(owner=self.user, name='First Store', slug='first-store')
+        Subscription.objects.filter(store=first).delete()
+        Subscription.objects.create(
+            store=first, plan='premium', status='trialing', amount=1999,
+            trial_ends_at=timezone.now() + timezone.timedelta(days=3),
+        )
+        second = Store(owner=self.user, name='Second Store', slug='second-store')
+        # The whole upgrade check is a single query
+        with self.assertNumQueries(1):
+            second.clean()
+
     def test_non_pro_store_create_view_redirects_to_edit(self):
         """View should redirect non-pro users trying to create an additional store to edit their existing store."""
         # create initial store
@@ -96,3 +114,179 @@ class StoreCreationTests(TestCase):
         # Should redirect to edit (302) and not create the second store
         self.assertEqual(resp.status_code, 302)
         self.assertFalse(Store.objects.filter(owner=self.user, slug='second-store').exists())
+
+    def test_model_rejects_non_image_logo_upload(self):
+        """Store.clean() validates new logo uploads no matter how the store is saved."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        store = Store(owner=self.user, name='Logo Store', slug='logo-store')
+        store.logo = SimpleUploadedFile('logo.txt', b'plain text', content_type='text/plain')
+        with self.assertRaises(ValidationError) as ctx:
+            store.save()
+        self.assertIn('logo', ctx.exception.message_dict)
+
+
+class StoreSaveTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='flagged', email='flag@example.com', password='pass')
+        self.store = Store.objects.create(owner=user, name='Flag Store', slug='flag-store')
+
+    def test_partial_save_skips_validation(self):
+        self.store.is_premium = True
+        with self.assertNumQueries(1):
+            self.store.save(update_fields=['is_premium'])
+        self.assertTrue(Store.objects.get(pk=self.store.pk).is_premium)
+
+    def test_deferred_fields_are_not_loaded_or_written(self):
+        store = Store.objects.only('id', 'owner', 'name', 'slug').get(pk=self.store.pk)
+        Store.objects.filter(pk=self.store.pk).update(description='Written elsewhere')
+        store.name = 'Renamed'
+        store.save()
+
+        self.assertIn('description', store.get_deferred_fields())
+        saved = Store.objects.get(pk=self.store.pk)
+        self.assertEqual(saved.name, 'Renamed')
+        self.assertEqual(saved.description, 'Written elsewhere')
+
+    def test_subscription_status_sync_does_not_save_the_store(self):
+        subscription = Subscription.objects.create(store=self.store, plan='premium', status='unpaid', amount=1999)
+        with patch.object(Store, 'save') as store_save:
+            subscription.set_status('active')
+        store_save.assert_not_called()
+        self.assertTrue(Store.objects.get(pk=self.store.pk).is_premium)
+
+
+class StoreStatsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='statowner', email='so@example.com', password='pass')
+        self.buyer = User.objects.create_user(username='statbuyer', email='sb@example.com', password='pass')
+        self.store = Store.objects.create(owner=self.owner, name='Stats Store', slug='stats-store')
+        self.listing = Listing.objects.create(
+            title='Lamp', price=Decimal('20.00'), description='Lamp',
+            seller=self.owner, store=self.store, is_active=True,
+        )
+
+    def test_review_and_sale_writes_refresh_the_cached_stats(self):
+        Review.objects.create(listing=self.listing, user=self.buyer, seller=self.owner, rating=4)
+        store_review = StoreReview.objects.create(store=self.store, reviewer=self.buyer, rating=5, comment='Good')
+        order = Order.objects.create(user=self.buyer, total_price=60)
+        OrderItem.objects.create(order=order, listing=self.listing, quantity=3, price=Decimal('20.00'))
+
+        store = Store.objects.get(pk=self.store.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(store.get_rating(), 4.5)
+            # JSON-serialisable, as the store API returns it directly
+            self.assertIsInstance(store.get_rating(), float)
+            self.assertEqual(store.get_average_store_rating(), 5.0)
+            self.assertEqual(store.get_review_count(), 2)
+            self.assertEqual(store.get_sales_count(), 3)
+
+        store_review.delete()
+        store.refresh_from_db()
+        self.assertEqual(store.get_rating(), 4.0)
+        self.assertEqual(store.get_review_count(), 1)
+
+    def test_saving_a_stale_store_keeps_the_cached_stats(self):
+        stale = Store.objects.get(pk=self.store.pk)
+        StoreReview.objects.create(store=self.store, reviewer=self.buyer, rating=3, comment='Ok')
+        stale.description = 'Updated'
+        stale.save()
+
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.description, 'Updated')
+        self.assertEqual(self.store.get_review_count(), 1)
+
+    def test_refresh_store_stats_command_rebuilds_the_columns(self):
+        Review.objects.create(listing=self.listing, user=self.buyer, seller=self.owner, rating=2)
+        Store.objects.filter(pk=self.store.pk).update(cached_rating=0, cached_review_count=0)
+
+        out = StringIO()
+        call_command('refresh_store_stats', stdout=out)
+        self.assertIn('Refreshed stats for 1 store(s)', out.getvalue())
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.get_rating(), 2.0)
+        self.assertEqual(self.store.get_review_count(), 1)
+
+
+class StoreReviewsTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(username='revowner', email='ro@example.com', password='pass')
+        self.store = Store.objects.create(owner=owner, name='Review Store', slug='review-store')
+        self.listing = Listing.objects.create(
+            title='Kettle', price=Decimal('15.00'), description='Kettle',
+            seller=owner, store=self.store, is_active=True,
+        )
+        self.reviewers = [
+            User.objects.create_user(username=f'rev{i}', email=f'rev{i}@example.com', password='pass')
+            for i in range(3)
+        ]
+        Review.objects.create(listing=self.listing, user=self.reviewers[0], seller=owner, rating=4, comment='Nice')
+        StoreReview.objects.create(store=self.store, reviewer=self.reviewers[1], rating=5, comment='Great')
+        Review.objects.create(listing=self.listing, user=self.reviewers[2], seller=owner, rating=4, comment='Fine')
+
+    def test_reviews_are_merged_and_paged_from_a_cursor(self):
+        # Page rows, reviewers and listings
+        with self.assertNumQueries(3):
+            reviews, cursor = self.store.get_all_reviews_paginated(per_page=2)
+        self.assertEqual([review['reviewer'] for review in reviews], [self.reviewers[2], self.reviewers[1]])
+        self.assertEqual(reviews[0]['listing'], self.listing)
+        self.assertEqual(reviews[1]['type'], 'store')
+        self.assertIsNone(reviews[1]['listing'])
+
+        reviews, cursor = self.store.get_all_reviews_paginated(cursor=cursor, per_page=2)
+        self.assertEqual([review['comment'] for review in reviews], ['Nice'])
+        self.assertIsNone(cursor)
+
+    def test_cursor_separates_product_and_store_reviews_with_the_same_key(self):
+        # A product and a store review sharing both timestamp and id
+        owner = self.store.owner
+        Review.objects.create(id=100, listing=self.listing, user=self.reviewers[1], seller=owner, rating=3)
+        StoreReview.objects.create(id=100, store=self.store, reviewer=self.reviewers[0], rating=3, comment='Same')
+        same_time = timezone.now()
+        Review.objects.update(created_at=same_time)
+        StoreReview.objects.update(created_at=same_time)
+
+        seen, cursor = [], None
+        while True:
+            reviews, cursor = self.store.get_all_reviews_paginated(cursor=cursor, per_page=1)
+            seen.extend((row['type'], row['id']) for row in reviews)
+            if cursor is None:
+                break
+        expected = [('product', pk) for pk in Review.objects.values_list('id', flat=True)]
+        expected += [('store', pk) for pk in StoreReview.objects.values_list('id', flat=True)]
+        self.assertEqual(sorted(seen), sorted(expected))
+
+    def test_invalid_cursor_starts_from_the_newest_review(self):
+        reviews, _ = self.store.get_all_reviews_paginated(cursor='not-a-cursor', per_page=1)
+        self.assertEqual(reviews[0]['comment'], 'Fine')
+
+    def test_has_user_reviewed_is_cached_until_the_user_reviews(self):
+        cache.clear()
+        newcomer = User.objects.create_user(username='newcomer', email='nc@example.com', password='pass')
+        with self.assertNumQueries(1):
+            self.assertTrue(self.store.has_user_reviewed(self.reviewers[0]))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.store.has_user_reviewed(self.reviewers[0]))
+
+        self.assertFalse(self.store.has_user_reviewed(newcomer))
+        StoreReview.objects.create(store=self.store, reviewer=newcomer, rating=3, comment='Ok')
+        self.assertTrue(self.store.has_user_reviewed(newcomer))
+
+    def test_product_reviews_come_with_listing_and_store(self):
+        with self.assertNumQueries(1):
+            stores = [review.listing.store.name for review in self.store.get_product_reviews()]
+        self.assertEqual(stores, ['Review Store', 'Review Store'])
+
+    def test_mark_helpful_counts_each_user_once(self):
+        review = StoreReview.objects.get(store=self.store)
+        self.assertTrue(review.mark_helpful(self.reviewers[0]))
+        self.assertFalse(review.mark_helpful(self.reviewers[0]))
+        self.assertTrue(review.mark_helpful(self.reviewers[2]))
+        self.assertEqual(review.helpful_count, 2)
+        self.assertEqual(StoreReview.objects.get(pk=review.pk).helpful_count, 2)
+
+    def test_store_reviews_page(self):
+        response = self.client.get(reverse('storefront:store_reviews', kwargs={'slug': self.store.slug}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_reviews'], 3)
+        self.assertEqual(response.context['rating_distribution'], {4: 2, 5: 1})
+        self.assertIsNone(response.context['next_cursor'])
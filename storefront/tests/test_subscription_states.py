@@ -1,9 +1,17 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from datetime import timedelta
+from decimal import Decimal
+from ..management.commands.process_subscriptions import Command as ProcessSubscriptionsCommand
 from ..models import Store, Subscription, MpesaPayment
 from ..subscription_service import SubscriptionService
+from ..tasks import initiate_subscription_renewal, process_subscription_renewals, process_subscriptions
+from ..utils.subscription_utils import enforce_expired_trials_for_user
 
 
 User = get_user_model()
@@ -76,3 +84,161 @@ class SubscriptionStateTests(TestCase):
             self.assertEqual(sub.status, 'trialing')
             self.store.refresh_from_db()
             self.assertTrue(self.store.is_premium)
+
+    def test_check_subscriptions_command_expires_lapsed_subscriptions(self):
+        Subscription.objects.filter(store=self.store).delete()
+        sub = Subscription.objects.create(
+            store=self.store, plan='basic', status='active', amount=999,
+            current_period_end=timezone.now() - timedelta(days=1),
+        )
+        call_command('check_subscriptions', stdout=StringIO())
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, 'past_due')
+        self.assertTrue(sub.metadata.get('payment_required'))
+
+    def test_process_subscriptions_task_runs_the_sweeps_in_process(self):
+        Subscription.objects.filter(store=self.store).delete()
+        sub = Subscription.objects.create(
+            store=self.store, plan='premium', status='trialing', amount=1999,
+            trial_ends_at=timezone.now() - timedelta(days=1),
+        )
+        with patch.object(ProcessSubscriptionsCommand, 'process_renewals') as mock_renewals:
+            process_subscriptions.apply()
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, 'canceled')
+        # Renewals have their own beat entry
+        mock_renewals.assert_not_called()
+
+        with patch.object(ProcessSubscriptionsCommand, 'process_renewals') as mock_renewals:
+            process_subscription_renewals.apply()
+        mock_renewals.assert_called_once_with()
+
+    def test_display_labels_come_from_the_choices(self):
+        sub = Subscription(store=self.store, plan='premium', status='past_due')
+        self.assertEqual(sub.get_plan_display(), 'Premium - KSh 1,999/month')
+        self.assertEqual(sub.get_status_display(), 'Past Due')
+        self.assertEqual(Subscription(store=self.store, plan='legacy').get_plan_display(), 'legacy')
+
+    def test_process_trial_expirations_cancels_unpaid_and_activates_paid_trials(self):
+        from listings.models import Listing
+
+        Subscription.objects.all().delete()
+        # Bypass the one-free-store check in Store.clean()
+        second_store, = Store.objects.bulk_create([Store(owner=self.user, name='TStore 2', slug='tstore-2')])
+        listing = Listing.objects.create(
+            title='Item', price=Decimal('10.00'), description='Item',
+            seller=self.user, store=second_store, is_active=True,
+        )
+        expired = timezone.now() - timedelta(days=1)
+        unpaid = Subscription.objects.create(store=self.store, plan='premium', status='trialing', trial_ends_at=expired)
+        # Featured while the trial ran
+        featured_listing = Listing.objects.create(
+            title='Featured', price=Decimal('10.00'), description='Featured',
+            seller=self.user, store=self.store, is_active=True, is_featured=True,
+        )
+        Store.objects.filter(pk=self.store.pk).update(is_featured=True)
+
+        payer = User.objects.create_user(username='payer', email='p@test.com', password='pass')
+        payer_store = Store.objects.create(owner=payer, name='Paid Store', slug='paid-store')
+        paid = Subscription.objects.create(store=payer_store, plan='basic', status='trialing', trial_ends_at=expired)
+        MpesaPayment.objects.create(
+            subscription=paid, checkout_request_id='CR-PAID', merchant_request_id='MR-PAID',
+            phone_number='+254712345678', amount=paid.amount, status='completed',
+        )
+
+        ProcessSubscriptionsCommand().process_trial_expirations()
+
+        unpaid.refresh_from_db()
+        paid.refresh_from_db()
+        self.store.refresh_from_db()
+        second_store.refresh_from_db()
+        listing.refresh_from_db()
+        self.assertEqual(unpaid.status, 'canceled')
+        self.assertEqual(paid.status, 'active')
+        self.assertIsNotNone(paid.current_period_end)
+        self.assertTrue(self.store.is_active)
+        self.assertFalse(second_store.is_active)
+        self.assertFalse(listing.is_active)
+        featured_listing.refresh_from_db()
+        self.assertFalse(self.store.is_featured)
+        self.assertFalse(featured_listing.is_featured)
+
+    @patch('storefront.management.commands.process_subscriptions.group')
+    def test_process_renewals_dispatches_one_task_per_due_subscription(self, mock_group):
+        Subscription.objects.all().delete()
+        sub = Subscription.objects.create(
+            store=self.store, plan='basic', status='active', amount=999,
+            current_period_end=timezone.now() - timedelta(days=1),
+        )
+        MpesaPayment.objects.create(
+            subscription=sub, checkout_request_id='CR-OLD', merchant_request_id='MR-OLD',
+            phone_number='0712345678', amount=999, status='completed',
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessSubscriptionsCommand().process_renewals()
+
+        signatures = mock_group.call_args.args[0]
+        self.assertEqual([tuple(sig.args) for sig in signatures], [(sub.id, '0712345678', self.store.id)])
+        mock_group.return_value.apply_async.assert_called_once_with()
+        sub.refresh_from_db()
+        self.assertIn('renewal_requested_at', sub.metadata)
+
+        # A second sweep inside the retry interval leaves the stamped row alone
+        mock_group.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessSubscriptionsCommand().process_renewals()
+        mock_group.assert_not_called()
+
+    @patch('storefront.management.commands.process_subscriptions.group')
+    def test_process_renewals_skips_subscriptions_with_a_pending_push(self, mock_group):
+        Subscription.objects.all().delete()
+        sub = Subscription.objects.create(
+            store=self.store, plan='basic', status='active', amount=999,
+            current_period_end=timezone.now() - timedelta(days=1),
+        )
+        for status, suffix in (('completed', 'OLD'), ('pending', 'NEW')):
+            MpesaPayment.objects.create(
+                subscription=sub, checkout_request_id=f'CR-{suffix}', merchant_request_id=f'MR-{suffix}',
+                phone_number='0712345678', amount=999, status=status,
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessSubscriptionsCommand().process_renewals()
+
+        mock_group.assert_not_called()
+
+    @patch('storefront.mpesa.MpesaGateway')
+    def test_initiate_subscription_renewal_records_payment_or_marks_past_due(self, mock_gateway):
+        Subscription.objects.all().delete()
+        sub = Subscription.objects.create(store=self.store, plan='basic', status='active', amount=999)
+        gateway = mock_gateway.return_value
+        gateway._normalize_phone.side_effect = lambda phone: '254712345678'
+        gateway.initiate_stk_push.return_value = {'CheckoutRequestID': 'CR-NEW', 'MerchantRequestID': 'MR-NEW'}
+
+        self.assertTrue(initiate_subscription_renewal(sub.id, '0712345678', self.store.id))
+        self.assertEqual(gateway.initiate_stk_push.call_args.kwargs['account_reference'], f'Store-{self.store.id}-Renewal')
+        self.assertTrue(MpesaPayment.objects.filter(checkout_request_id='CR-NEW', status='pending').exists())
+
+        gateway.initiate_stk_push.side_effect = RuntimeError('gateway down')
+        self.assertFalse(initiate_subscription_renewal(sub.id, '0712345678', self.store.id))
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, 'past_due')
+
+    def test_enforce_expired_trials_locks_extra_stores_once_per_user(self):
+        Subscription.objects.all().delete()
+        # Bypass the one-free-store check in Store.clean()
+        second_store, = Store.objects.bulk_create([Store(owner=self.user, name='TStore 2', slug='tstore-2')])
+        expired = timezone.now() - timedelta(days=1)
+        for store in (self.store, second_store):
+            Subscription.objects.create(store=store, plan='premium', status='trialing', trial_ends_at=expired)
+
+        self.assertEqual(enforce_expired_trials_for_user(self.user), 2)
+
+        self.assertEqual(set(Subscription.objects.values_list('status', flat=True)), {'canceled'})
+        self.store.refresh_from_db()
+        second_store.refresh_from_db()
+        self.assertTrue(self.store.is_active)
+        self.assertFalse(second_store.is_active)
+        with self.assertNumQueries(1):
+            self.assertEqual(enforce_expired_trials_for_user(self.user), 0)
@@ -0,0 +1,40 @@
+from datetime import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Store, WithdrawalRequest
+
+
+User = get_user_model()
+
+
+class ProcessWithdrawalsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='payee', email='payee@example.com', password='pass')
+        self.store = Store.objects.create(owner=user, name='Payout Store', slug='payout-store')
+        Store.objects.filter(pk=self.store.pk).update(payout_phone='254712345678', payout_verified=True)
+        self.thursday = timezone.make_aware(datetime(2026, 10, 15, 9, 0))
+        self.withdrawals = [
+            WithdrawalRequest.objects.create(
+                store=self.store, amount=5000, status='scheduled', scheduled_for=self.thursday,
+            )
+            for _ in range(2)
+        ]
+
+    @patch('storefront.payout.payout_to_phone', return_value=(True, 'PAYOUT-REF'))
+    def test_scheduled_withdrawals_are_paid_with_one_write_each(self, mock_payout):
+        with patch('django.utils.timezone.now', return_value=self.thursday):
+            # One SELECT for the batch (with stores) and one UPDATE per withdrawal
+            with self.assertNumQueries(3):
+                call_command('process_withdrawals', stdout=StringIO())
+
+        self.assertEqual(mock_payout.call_count, 2)
+        for withdrawal in self.withdrawals:
+            withdrawal.refresh_from_db()
+            self.assertEqual(withdrawal.status, 'processed')
+            self.assertEqual(withdrawal.reference, 'PAYOUT-REF')
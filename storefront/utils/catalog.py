@@ -0,0 +1,15 @@
+# storefront/utils/catalog.py
+from django.db.models import Exists, OuterRef
+
+from listings.models import Category, Listing
+
+
+def store_categories(store):
+    """Categories that have at least one listing in ``store``.
+
+    Uses an EXISTS subquery rather than joining listings and applying
+    DISTINCT, so each category is matched by a single index probe.
+    """
+    return Category.objects.filter(
+        Exists(Listing.objects.filter(category=OuterRef('pk'), store=store))
+    )
@@ -6,7 +6,7 @@ Some models (e.g. ProductBundle, BatchJob) live in migrations that may not
 have been applied yet in every environment.  Wrapping those queries with
 ``safe_db_query`` prevents 500 errors and lets the rest of the page render.
 """
-from django.db import DatabaseError, OperationalError, ProgrammingError
+from django.db import DatabaseError, OperationalError, ProgrammingError, connection
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,3 +54,20 @@ def safe_db_query(callable_or_queryset, default=None, warn=True):
                 exc,
             )
         return default
+
+
+def database_available():
+    """
+    Return ``True`` if the default database connection can serve queries.
+
+    Opens the connection if needed and runs the backend's cheap liveness
+    check (``SELECT 1`` on PostgreSQL).  Callers that issue several
+    independent queries can use this to bail out once instead of paying a
+    failed round trip per query while the database is degraded.
+    """
+    try:
+        connection.ensure_connection()
+        return connection.is_usable()
+    except _DB_ERRORS as exc:
+        logger.warning("Database unavailable: %s", exc)
+        return False
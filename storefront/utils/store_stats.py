@@ -0,0 +1,45 @@
+# storefront/utils/store_stats.py
+from django.db.models import Avg, Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from listings.models import OrderItem, Review
+from ..models import StoreReview
+
+
+def _per_store(model, store_lookup, aggregate, output_field):
+    """Correlated subquery computing ``aggregate`` over the store's ``model`` rows."""
+    return Subquery(
+        model.objects.filter(**{store_lookup: OuterRef('pk')})
+        .order_by()
+        .values(store_lookup)
+        .annotate(value=aggregate)
+        .values('value'),
+        output_field=output_field,
+    )
+
+
+def refresh_store_stats(stores):
+    """Recompute the cached review and sales columns of ``stores``.
+
+    ``stores`` is a Store queryset; every row is refreshed by a single UPDATE
+    with correlated subqueries, so this never calls Store.save().
+    """
+    product_avg = _per_store(Review, 'listing__store', Avg('rating'), FloatField())
+    store_avg = _per_store(StoreReview, 'store', Avg('rating'), FloatField())
+    return stores.update(
+        # Mean of the two averages when the store has both kinds of review
+        cached_rating=Coalesce(
+            Round((product_avg + store_avg) / 2, 1),
+            Round(product_avg, 1),
+            Round(store_avg, 1),
+            Value(0.0),
+        ),
+        cached_store_rating=Coalesce(Round(store_avg, 1), Value(0.0)),
+        cached_review_count=(
+            Coalesce(_per_store(Review, 'listing__store', Count('pk'), IntegerField()), Value(0))
+            + Coalesce(_per_store(StoreReview, 'store', Count('pk'), IntegerField()), Value(0))
+        ),
+        cached_sales_count=Coalesce(
+            _per_store(OrderItem, 'listing__store', Sum('quantity'), IntegerField()), Value(0)
+        ),
+    )
@@ -2,6 +2,7 @@
 from datetime import datetime
 from django.utils import timezone
 from django.core.cache import cache
+from django.db import connection
 from storefront.models import Subscription
 
 
@@ -16,6 +17,24 @@ def get_store_subscription(store):
     
     return subscription
 
+def latest_subscriptions_by_store(owner):
+    """Map store id -> most recent subscription for every store owned by ``owner``.
+
+    On PostgreSQL this is a single ``DISTINCT ON (store_id)`` query; other
+    backends fetch the ordered rows and keep the first one seen per store.
+    """
+    subscriptions = Subscription.objects.filter(
+        store__owner_id=owner.pk
+    ).select_related('store').order_by('store_id', '-created_at')
+
+    if connection.features.can_distinct_on_fields:
+        return {sub.store_id: sub for sub in subscriptions.distinct('store_id')}
+
+    latest = {}
+    for sub in subscriptions:
+        latest.setdefault(sub.store_id, sub)
+    return latest
+
 def can_access_feature(store, feature_name):
     """Check if store can access a specific feature"""
     subscription = get_store_subscription(store)
@@ -63,6 +63,29 @@ def check_listing_requires_upgrade(user, store=None):
     return requires_upgrade, limit_info
 
 
+def lock_stores_except_first(owner_ids):
+    """Keep each owner's first store active, deactivate the rest and their listings.
+
+    The first store of every owner is looked up in a single query, so the
+    cost does not grow with the number of expired trials per owner.
+    """
+    from storefront.models import Store
+
+    first_store_ids = {}
+    for store_id, owner_id in Store.objects.filter(
+        owner_id__in=owner_ids
+    ).order_by('owner_id', 'created_at').values_list('id', 'owner_id'):
+        first_store_ids.setdefault(owner_id, store_id)
+
+    owner_stores = Store.objects.filter(owner_id__in=owner_ids)
+    # Ensure the first stores remain active but not premium
+    owner_stores.filter(id__in=first_store_ids.values()).update(is_premium=False, is_active=True)
+    other_stores = owner_stores.exclude(id__in=first_store_ids.values())
+    # Disable all listings for the other stores before deactivating them
+    Listing.objects.filter(store__in=other_stores).update(is_active=False)
+    other_stores.update(is_premium=False, is_active=False)
+
+
 def enforce_expired_trials_for_user(user):
     """Cancel expired trials without payment and lock stores/listings except the first.
 
@@ -70,55 +93,41 @@ def enforce_expired_trials_for_user(user):
     performs a quick query for subscriptions that have expired and processes
     them. It's idempotent.
     """
-    from storefront.models import Subscription, Store, MpesaPayment
-    from django.utils import timezone
-    from listings.models import Listing
+    from storefront.models import Subscription, MpesaPayment
+    from django.db.models import Exists, OuterRef
 
     now = timezone.now()
     expired_trials = Subscription.objects.filter(
         store__owner=user,
         status='trialing',
         trial_ends_at__lte=now
+    ).annotate(
+        # A completed payment converts the trial instead of cancelling it
+        has_payment=Exists(MpesaPayment.objects.filter(
+            subscription=OuterRef('pk'),
+            status='completed'
+        ))
     )
 
-    if not expired_trials.exists():
+    expired_trials = list(expired_trials)
+    if not expired_trials:
         return 0
 
     processed = 0
-    for subscription in expired_trials.select_related('store'):
-        # If a completed payment exists, convert to active
-        has_payment = MpesaPayment.objects.filter(
-            subscription=subscription,
-            status='completed'
-        ).exists()
-
-        if has_payment:
-            subscription.status = 'active'
-            subscription.next_billing_date = now + timezone.timedelta(days=30)
+    canceled = False
+    with transaction.atomic():
+        for subscription in expired_trials:
+            if subscription.has_payment:
+                subscription.status = 'active'
+                subscription.current_period_end = now + timezone.timedelta(days=30)
+            else:
+                subscription.status = 'canceled'
+                canceled = True
             subscription.save()
             processed += 1
-            continue
-
-        # No payment: cancel and lock stores except the first
-        with transaction.atomic():
-            subscription.status = 'cancelled'
-            subscription.save()
-
-            owner = subscription.store.owner
-            owner_stores = Store.objects.filter(owner=owner).order_by('created_at')
-            first = owner_stores.first()
-
-            for s in owner_stores:
-                if first and s.id == first.id:
-                    s.is_premium = False
-                    s.is_active = True
-                    s.save()
-                    continue
-                s.is_premium = False
-                s.is_active = False
-                s.save()
-                Listing.objects.filter(store=s).update(is_active=False)
 
-        processed += 1
+        # No payment: lock the user's stores except the first, once for all trials
+        if canceled:
+            lock_stores_except_first([user.pk])
 
-    return processed
\ No newline at end of file
+    return processed
@@ -17,13 +17,12 @@ from django.views.decorators.csrf import csrf_exempt
 import json
 import logging
 from decimal import Decimal
-from collections import defaultdict
 from .decorators import store_owner_required, analytics_access_required, store_limit_check
 from .utils.db import safe_db_query
 from .models import Store, Subscription, MpesaPayment, StockMovement, StoreReview, WithdrawalRequest, StoreVideo
 from .models import PayoutVerification
 from .mpesa import MpesaGateway
-from .forms import StoreForm, UpgradeForm, SubscriptionPlanForm, StoreReviewForm
+from .forms import StoreForm, UpgradeForm, SubscriptionPlanForm, StoreReviewForm, store_feature_flags
 from .mpesa import MpesaGateway
 from .monitoring import PaymentMonitor
 from listings.models import Listing, Category, Favorite, ListingImage, Order, OrderItem, Payment
@@ -368,16 +367,10 @@ def store_create(request):
             store.is_featured = False
             
             try:
-                # This will trigger the clean() method which enforces store limits
-                store.full_clean()
-                store.save()
-
-                # Process logo and cover image
-                if 'logo' in request.FILES:
-                    store.logo = request.FILES['logo']
-                if 'cover_image' in request.FILES:
-                    store.cover_image = request.FILES['cover_image']
-                store.save()
+                # save() runs full_clean(), which enforces store limits; the
+                # logo and cover image were already set on the instance by
+                # form.save(commit=False), so one save stores everything.
+                form.save_store(store)
 
                 # Process store videos (max 3)
                 videos = request.FILES.getlist('store_videos')
@@ -474,24 +467,8 @@ def store_edit(request, slug):
     # Only check if store has a primary key
     if store.pk:
         try:
-            has_active = Subscription.objects.filter(
-                store=store, 
-                status='active'
-            ).exists()
-            has_valid_trial = Subscription.objects.filter(
-                store=store,
-                status='trialing',
-                trial_ends_at__gt=timezone.now()
-            ).exists()
-            can_be_featured = has_active or has_valid_trial
-            
-            # Check if it's enterprise
-            if can_be_featured:
-                is_enterprise = Subscription.objects.filter(
-                    store=store,
-                    status='active',
-                    plan='enterprise'
-                ).exists()
+            # Memoised on the request, so StoreForm below reuses the same query
+            can_be_featured, is_enterprise = store_feature_flags(store, request)
         except Exception as e:
             # If there's any error with subscription check, default to not featured
             logger.error(f"Error checking subscription: {e}")
@@ -499,7 +476,7 @@ def store_edit(request, slug):
             is_enterprise = False
     
     if request.method == 'POST':
-        form = StoreForm(request.POST, request.FILES, instance=store, user=request.user)
+        form = StoreForm(request.POST, request.FILES, instance=store, user=request.user, request=request)
         
         if form.is_valid():
             try:
@@ -569,7 +546,7 @@ def store_edit(request, slug):
     
     else:
         # GET request - initialize form with instance
-        form = StoreForm(instance=store, user=request.user)
+        form = StoreForm(instance=store, user=request.user, request=request)
     
     context = {
         'form': form,
@@ -2053,18 +2030,14 @@ def store_reviews(request, slug):
     """
     store = get_object_or_404(Store, slug=slug)
     
-    # Get page number from query params
-    page = request.GET.get('page', 1)
+    # Position of the page in the review list, from the previous page's link
+    cursor = request.GET.get('cursor')
     
     # Get paginated reviews
-    reviews_page = store.get_all_reviews_paginated(page=page, per_page=10)
+    reviews, next_cursor = store.get_all_reviews_paginated(cursor=cursor, per_page=10)
     
     # Calculate rating distribution for all reviews
-    rating_distribution = defaultdict(int)
-    all_reviews = store.get_all_reviews()
-    
-    for review in all_reviews:
-        rating_distribution[review['rating']] += 1
+    rating_distribution = store.get_rating_distribution()
     
     # Get average rating
     avg_rating = store.get_rating()
@@ -2081,12 +2054,14 @@ def store_reviews(request, slug):
     
     context = {
         'store': store,
-        'reviews': reviews_page,
+        'reviews': reviews,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
         'avg_rating': avg_rating,
-        'rating_distribution': dict(sorted(rating_distribution.items())),
+        'rating_distribution': rating_distribution,
         'user_has_reviewed': user_has_reviewed,
         'user_review': user_review,
-        'total_reviews': len(all_reviews),
+        'total_reviews': store.get_review_count(),
     }
     
     return render(request, 'storefront/store_reviews.html', context)